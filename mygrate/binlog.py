@@ -25,6 +25,7 @@ import os
 import sys
 import os.path
 import re
+import errno
 import signal
 import subprocess
 import optparse
@@ -33,10 +34,17 @@ import time
 from datetime import datetime
 from ast import literal_eval
 from time import sleep
+from distutils.spawn import find_executable
 
 import MySQLdb
 import bitstring
 
+from .events import BinlogEventReader
+from .checkpoint import CheckpointStore
+from .dispatch import Dispatcher
+from .coroutines import CoroutineDispatcher
+from .pipeline import Pipeline
+
 
 class ValueParser(object):
     """The mysqlbinlog command has its own unique way of serializing its
@@ -139,6 +147,157 @@ class ValueParser(object):
     def parse(cls, line):
         return cls(line).value
 
+    @classmethod
+    def get_decoder(cls, data_type, column_type=''):
+        """Builds a function that decodes values of a single column, given its
+        type information from ``INFORMATION_SCHEMA``. The function skips
+        straight to the conversion for that type, falling back to
+        :meth:`parse` if the value is not in the expected format. Columns of
+        unknown types always use :meth:`parse`.
+
+        :param data_type: The ``DATA_TYPE`` of the column, e.g. ``int``.
+        :param column_type: The ``COLUMN_TYPE`` of the column, e.g.
+                            ``int(10) unsigned``.
+        :returns: A function that takes a value string and returns the value.
+
+        """
+        data_type = data_type.lower()
+        if data_type in _int_types:
+            if 'unsigned' in column_type.lower():
+                return _decode_unsigned_int
+            return _decode_signed_int
+        return _decoders_by_type.get(data_type, cls.parse)
+
+
+def _decode_signed_int(line):
+    if line == 'NULL':
+        return None
+    try:
+        return int(line.split(' ', 1)[0])
+    except ValueError:
+        return ValueParser.parse(line)
+
+
+def _decode_unsigned_int(line):
+    if line == 'NULL':
+        return None
+    try:
+        if line[-1] == ')':
+            return int(line[line.index('(')+1:-1])
+        return int(line)
+    except ValueError:
+        return ValueParser.parse(line)
+
+
+def _decode_float(line):
+    if line == 'NULL':
+        return None
+    try:
+        return float(line)
+    except ValueError:
+        return ValueParser.parse(line)
+
+
+def _decode_quoted(line):
+    if len(line) >= 2 and line[0] == "'" and line[-1] == "'":
+        return line[1:-1]
+    return ValueParser.parse(line)
+
+
+def _unquote(line):
+    if len(line) >= 2 and line[0] == "'" and line[-1] == "'":
+        return line[1:-1]
+    return line
+
+
+def _decode_datetime(line):
+    if line == 'NULL':
+        return None
+    line = _unquote(line)
+    try:
+        if len(line) > 20 and line[19] == '.':
+            usec = int(line[20:26].ljust(6, '0'))
+        elif len(line) == 19:
+            usec = 0
+        else:
+            return ValueParser.parse(line)
+        return datetime(int(line[0:4]), int(line[5:7]), int(line[8:10]),
+                        int(line[11:13]), int(line[14:16]), int(line[17:19]),
+                        usec)
+    except ValueError:
+        return ValueParser.parse(line)
+
+
+def _decode_date(line):
+    if line == 'NULL':
+        return None
+    line = _unquote(line)
+    try:
+        if len(line) != 10:
+            return ValueParser.parse(line)
+        return datetime(int(line[0:4]), int(line[5:7]), int(line[8:10]))
+    except ValueError:
+        return ValueParser.parse(line)
+
+
+def _decode_time(line):
+    if line == 'NULL':
+        return None
+    line = _unquote(line)
+    try:
+        return time.strptime(line, '%H:%M:%S')
+    except ValueError:
+        return ValueParser.parse(line)
+
+
+def _decode_bitstring(line):
+    if line[:2] != "b'" or line[-1] != "'":
+        return ValueParser.parse(line)
+    try:
+        return bitstring.Bits(bin='0b{0}'.format(line[2:-1])).tobytes()
+    except bitstring.Error:
+        return ValueParser.parse(line)
+
+
+_int_types = frozenset(['tinyint', 'smallint', 'mediumint', 'int', 'integer',
+                        'bigint', 'year', 'enum'])
+
+_decoders_by_type = {'float': _decode_float,
+                     'double': _decode_float,
+                     'real': _decode_float,
+                     'decimal': _decode_float,
+                     'numeric': _decode_float,
+                     'timestamp': _decode_float,
+                     'char': _decode_quoted,
+                     'varchar': _decode_quoted,
+                     'binary': _decode_quoted,
+                     'varbinary': _decode_quoted,
+                     'tinytext': _decode_quoted,
+                     'text': _decode_quoted,
+                     'mediumtext': _decode_quoted,
+                     'longtext': _decode_quoted,
+                     'tinyblob': _decode_quoted,
+                     'blob': _decode_quoted,
+                     'mediumblob': _decode_quoted,
+                     'longblob': _decode_quoted,
+                     'datetime': _decode_datetime,
+                     'date': _decode_date,
+                     'time': _decode_time,
+                     'bit': _decode_bitstring,
+                     'set': _decode_bitstring}
+
+
+def build_decoders(column_types):
+    """Builds the list of value decoders for a table, one per column.
+
+    :param column_types: List of ``(DATA_TYPE, COLUMN_TYPE)`` pairs, in column
+                         order.
+    :returns: List of decoder functions, in column order.
+
+    """
+    return [ValueParser.get_decoder(data_type, column_type)
+            for data_type, column_type in column_types]
+
 
 class QueryBase(object):
     """The base class for keeping track of a single query loaded in from the
@@ -154,7 +313,8 @@ class QueryBase(object):
     _column_pattern = re.compile(r'^  @(\d+)=(.*)$')
     _int_pattern = re.compile(r'\(([^\)]*)\)')
 
-    def __init__(self, line, callbacks, column_names, char_sets):
+    def __init__(self, line, callbacks, column_names, char_sets,
+                 column_decoders=None):
         self.callbacks = callbacks
         self.column_names = column_names
         self.char_sets = char_sets
@@ -163,6 +323,9 @@ class QueryBase(object):
         self.current_value_type = None
         self.values = {'WHERE': [], 'SET': []}
         self._parse_initial_line(line)
+        self.decoders = None
+        if column_decoders:
+            self.decoders = column_decoders.get(self.table)
 
     def _parse_initial_line(self, line):
         match = self._initial_pattern.match(line)
@@ -172,8 +335,11 @@ class QueryBase(object):
         identifiers = [ident.strip('`') for ident in match.group(1).split('.')]
         self.table = '.'.join(identifiers)
 
-    def _parse_value(self, value, char_set):
-        parsed = ValueParser.parse(value)
+    def _parse_value(self, value, char_set, decoder=None):
+        if decoder:
+            parsed = decoder(value)
+        else:
+            parsed = ValueParser.parse(value)
         if char_set and isinstance(parsed, str):
             return parsed.decode(char_set)
         return parsed
@@ -194,9 +360,40 @@ class QueryBase(object):
             self.invalid = True
             return
         char_set = self.char_sets.get(self.table)
-        col_value = self._parse_value(match.group(2), char_set)
+        decoder = None
+        if self.decoders:
+            i = int(match.group(1)) - 1
+            if i < len(self.decoders):
+                decoder = self.decoders[i]
+        col_value = self._parse_value(match.group(2), char_set, decoder)
         self.values[self.current_value_type].append(col_value)
 
+    def _build_dict(self, value_type):
+        table_column_names = self.column_names[self.table]
+        vals = {}
+        for i, val in enumerate(self.values[value_type]):
+            key = table_column_names[i]
+            vals[key] = val
+        return vals
+
+    def get_change(self):
+        """Builds the change made by the query, as given to transaction
+        callbacks.
+
+        :returns: Tuple of the table, the action, and the tuple of arguments
+                  that would be passed to the callback.
+
+        """
+        return self.table, self.type, self.get_args()
+
+    def finish(self):
+        """When the query is finished, its numeric column references are
+        translated into column names using a lookup table, resulting in dict
+        objects that are then passed to the callback.
+
+        """
+        self.callbacks.execute(self.table, self.type, *self.get_args())
+
     def __repr__(self):
         return '<Query {0} {1} WHERE={2!s} SET={3!s}>'.format(
             self.type,
@@ -209,58 +406,36 @@ class InsertQuery(QueryBase):
     _initial_pattern = re.compile(r'^INSERT INTO (.*)$')
     type = 'INSERT'
 
-    def finish(self):
-        """When the query is finished, its numeric column references are
-        translated into column names using a lookup table, resulting in a dict
-        object that is then passed to the callback.
+    def get_args(self):
+        """Builds the callback arguments for the query, which is a dict of the
+        new row.
 
         """
-        table_column_names = self.column_names[self.table]
-        set_vals = {}
-        for i, val in enumerate(self.values['SET']):
-            key = table_column_names[i]
-            set_vals[key] = val
-        self.callbacks.execute(self.table, self.type, set_vals)
+        return (self._build_dict('SET'), )
 
 
 class UpdateQuery(QueryBase):
     _initial_pattern = re.compile(r'^UPDATE (.*)$')
     type = 'UPDATE'
 
-    def finish(self):
-        """When the query is finished, its numeric column references are
-        translated into column names using a lookup table, resulting in a dict
-        object that is then passed to the callback.
+    def get_args(self):
+        """Builds the callback arguments for the query, which are a dict of the
+        row before the update and a dict of the row after the update.
 
         """
-        table_column_names = self.column_names[self.table]
-        where_vals = {}
-        for i, val in enumerate(self.values['WHERE']):
-            key = table_column_names[i]
-            where_vals[key] = val
-        set_vals = {}
-        for i, val in enumerate(self.values['SET']):
-            key = table_column_names[i]
-            set_vals[key] = val
-        self.callbacks.execute(self.table, self.type, where_vals, set_vals)
+        return self._build_dict('WHERE'), self._build_dict('SET')
 
 
 class DeleteQuery(QueryBase):
     _initial_pattern = re.compile(r'^DELETE FROM (.*)$')
     type = 'DELETE'
 
-    def finish(self):
-        """When the query is finished, its numeric column references are
-        translated into column names using a lookup table, resulting in a dict
-        object that is then passed to the callback.
+    def get_args(self):
+        """Builds the callback arguments for the query, which is a dict of the
+        deleted row.
 
         """
-        table_column_names = self.column_names[self.table]
-        where_vals = {}
-        for i, val in enumerate(self.values['WHERE']):
-            key = table_column_names[i]
-            where_vals[key] = val
-        self.callbacks.execute(self.table, self.type, where_vals)
+        return (self._build_dict('WHERE'), )
 
 
 class QueryParser(object):
@@ -268,13 +443,20 @@ class QueryParser(object):
     new query, it marks the previous query as finished and sends it to the
     callback.
 
+    Within a transaction, finished queries are held until the transaction is
+    committed, and then all of them are sent to the callbacks together with
+    :meth:`~mygrate.callbacks.MygrateCallbacks.execute_transaction`.
+
     """
 
-    def __init__(self, callbacks, column_names, char_sets):
+    def __init__(self, callbacks, column_names, char_sets,
+                 column_decoders=None):
         self.current = None
+        self.transaction = None
         self.callbacks = callbacks
         self.column_names = column_names
         self.char_sets = char_sets
+        self.column_decoders = column_decoders
 
     def parse(self, line):
         """Checks if the line is the beginning of a new query or should be added
@@ -287,61 +469,137 @@ class QueryParser(object):
         if line.startswith('INSERT'):
             self._handle_completion()
             query = InsertQuery(line, self.callbacks, self.column_names,
-                                self.char_sets)
+                                self.char_sets, self.column_decoders)
             self.current = query if query.table in registered_tables else None
         elif line.startswith('UPDATE'):
             self._handle_completion()
             query = UpdateQuery(line, self.callbacks, self.column_names,
-                                self.char_sets)
+                                self.char_sets, self.column_decoders)
             self.current = query if query.table in registered_tables else None
         elif line.startswith('DELETE'):
             self._handle_completion()
             query = DeleteQuery(line, self.callbacks, self.column_names,
-                                self.char_sets)
+                                self.char_sets, self.column_decoders)
             self.current = query if query.table in registered_tables else None
         elif self.current:
             self.current.parse(line)
 
+    def parse_statement(self, line):
+        """Checks a statement line from outside of the row events for the
+        beginning or end of a transaction.
+
+        :param line: The line to process.
+        :returns: True if the line ended a transaction.
+
+        """
+        if line == 'BEGIN':
+            self._handle_completion()
+            self.current = None
+            self.transaction = []
+        elif line.startswith('COMMIT') or line.startswith('ROLLBACK'):
+            if self.transaction is not None:
+                self.commit()
+                return True
+        return False
+
+    def commit(self):
+        """Called at the end of a transaction, so that all of its queries can
+        be sent to the callbacks.
+
+        """
+        self._handle_completion()
+        self.current = None
+        changes, self.transaction = self.transaction, None
+        if changes:
+            self.callbacks.execute_transaction(changes)
+
+    @property
+    def in_transaction(self):
+        return self.transaction is not None
+
     def finish(self):
         """Called at the end of the binlog, so that the current query can be
-        marked complete and sent to the callback.
+        marked complete and sent to the callback. The queries of a transaction
+        that was not committed are discarded, they are read again on the next
+        sweep because the position is only advanced at commit.
 
         """
         self._handle_completion()
         self.current = None
+        self.transaction = None
 
     def _handle_completion(self):
         if self.current:
-            self.current.finish()
+            if self.transaction is None:
+                self.current.finish()
+            else:
+                self.transaction.append(self.current.get_change())
 
 
 class BinlogParser(object):
 
+    _rotate_pattern = re.compile(r'\tRotate to (\S+)\s+pos: (\d+)')
+    _follow_options = [('host', '--host'),
+                       ('port', '--port'),
+                       ('user', '--user'),
+                       ('unix_socket', '--socket')]
+
     def __init__(self, index_file, pos_dir, callbacks, column_names=None,
-                 char_sets=None):
+                 char_sets=None, column_types=None, native=False,
+                 checkpoints=None, workers=0, pipeline=False,
+                 concurrency=0):
         self.done = False
+        self.native = native
         self.index_file = index_file
         self.pos_dir = pos_dir
+        if checkpoints is None and pos_dir:
+            checkpoints = CheckpointStore(pos_dir)
+        self.checkpoints = checkpoints
+        self.primary_keys = {}
+        self.dispatcher = None
+        if workers:
+            self.dispatcher = Dispatcher(callbacks, self.primary_keys, workers)
+            callbacks = self.dispatcher
+        elif concurrency:
+            self.dispatcher = CoroutineDispatcher(callbacks, self.primary_keys,
+                                                  concurrency)
+            callbacks = self.dispatcher
+        self.pipeline = None
+        if pipeline:
+            self.pipeline = Pipeline(callbacks, self._dispatch_checkpoint)
+            callbacks = self.pipeline
         self.callbacks = callbacks
         self.column_names = column_names or {}
         self.char_sets = char_sets or {}
+        self.column_types = column_types or {}
+        self.column_decoders = {}
+        for full_table, types in self.column_types.items():
+            self.column_decoders[full_table] = build_decoders(types)
         self.binlog_mtimes = {}
+        self.binlog_tail = []
         self.log = logging.getLogger('mygrate.binlog')
 
-    def _load_one_table_names(self, conn, db, table):
+    def _load_one_table_columns(self, conn, db, table):
         cur = conn.cursor()
         try:
-            cur.execute("""SELECT `COLUMN_NAME` FROM
-                           `INFORMATION_SCHEMA`.`COLUMNS`
-                           WHERE `TABLE_SCHEMA`=%s AND `TABLE_NAME`=%s""",
+            cur.execute("""SELECT `COLUMN_NAME`, `DATA_TYPE`, `COLUMN_TYPE`,
+                                  `COLUMN_KEY`
+                           FROM `INFORMATION_SCHEMA`.`COLUMNS`
+                           WHERE `TABLE_SCHEMA`=%s AND `TABLE_NAME`=%s
+                           ORDER BY `ORDINAL_POSITION`""",
                         (db, table))
-            return [row[0] for row in cur.fetchall()]
+            rows = cur.fetchall()
+            names = [row[0] for row in rows]
+            types = [(row[1], row[2]) for row in rows]
+            keys = [row[0] for row in rows if row[3] == 'PRI']
+            return names, types, keys
         finally:
             cur.close()
 
     def load_column_names(self, mysql_info):
-        """Connects to the MySQL server and loads column names for all the
-        tables for which there are callbacks.
+        """Connects to the MySQL server and loads column names, types and
+        primary keys for all the tables for which there are callbacks. The
+        column types are used to build a value decoder for each column.
 
         :param mysql_info: Contains the details about the MySQL connection.
 
@@ -352,8 +610,12 @@ class BinlogParser(object):
         try:
             for full_table in self.callbacks.get_registered_tables():
                 db, table = full_table.split('.', 1)
-                names = self._load_one_table_names(conn, db, table)
+                names, types, keys = self._load_one_table_columns(conn, db,
+                                                                  table)
                 self.column_names[full_table] = names
+                self.column_types[full_table] = types
+                self.primary_keys[full_table] = keys
+                self.column_decoders[full_table] = build_decoders(types)
         finally:
             conn.close()
 
@@ -390,7 +652,8 @@ AND `T`.`TABLE_NAME` = %s""", (db, table))
             conn.close()
 
     def read_position(self, pos_file):
-        """Reads the latest binlog position from the position tracking file.
+        """Reads the latest binlog position from a position tracking file, as
+        written by previous versions that kept one file per binlog.
 
         :param pos_file: The path to the position tracking file.
         :returns: The position from the file, if it exists, or 0.
@@ -406,19 +669,68 @@ AND `T`.`TABLE_NAME` = %s""", (db, table))
                 raise
         return '0'
 
-    def write_position(self, f, pos):
-        """Writes the binlog position to the position tracking file, immediately
-        flushing write caches to disk. The file is always truncated before
-        being written to so that its contents are only the latest position.
+    def get_position(self, binlog):
+        """Gets the latest position of the binlog from the checkpoint store,
+        falling back to the binlog's old position tracking file.
+
+        :param binlog: The binlog file path.
+        :returns: The latest position, or 0.
+
+        """
+        position = self.checkpoints.get(binlog)
+        if position is None:
+            position = self.read_position(self.build_pos_file(binlog))
+        return position
+
+    def write_position(self, binlog, pos, commit=False):
+        """Updates the binlog position in the checkpoint store, which decides
+        when it is written to disk based on its flush policy. When callbacks
+        are run by worker threads, the update waits until the workers have
+        finished every change before the position.
 
-        :param f: The file object to write to.
-        :param pos: The position to write to f.
+        :param binlog: The binlog file path.
+        :param pos: The new position of the binlog.
+        :param commit: True if the position is at the end of a transaction.
 
         """
-        f.seek(0, os.SEEK_SET)
-        f.truncate()
-        f.write(pos)
-        f.flush()
+        self._checkpoint(self.checkpoints.update, binlog, pos, commit)
+
+    def _checkpoint(self, func, *args):
+        if self.pipeline:
+            self.pipeline.checkpoint(func, *args)
+        else:
+            self._dispatch_checkpoint(func, *args)
+
+    def _dispatch_checkpoint(self, func, *args):
+        if self.dispatcher:
+            self.dispatcher.checkpoint(func, *args)
+        else:
+            func(*args)
+
+    def _drain(self):
+        for stage in (self.pipeline, self.dispatcher):
+            if stage:
+                try:
+                    stage.wait()
+                except Exception:
+                    self.log.exception('Unhandled exception')
+        if self.pipeline:
+            self.log.debug('pipeline stats: {0!r}'.format(
+                self.pipeline.get_stats()))
+
+    def _iter_lines(self, stream):
+        if self.pipeline:
+            return self.pipeline.read_lines(stream, lambda: self.done)
+        return self._readlines(stream)
+
+    def close(self):
+        """Waits for any callbacks still running on other threads, and then
+        stops the threads.
+
+        """
+        for stage in (self.pipeline, self.dispatcher):
+            if stage:
+                stage.close()
 
     def read_index(self):
         """Reads the known binlog file paths from the binlog index file, which
@@ -437,8 +749,8 @@ AND `T`.`TABLE_NAME` = %s""", (db, table))
             return ret
 
     def build_pos_file(self, binlog):
-        """Given a binlog file path, build a corresponding position tracking
-        file path based on the configured tracking directory.
+        """Given a binlog file path, build the path of the position tracking
+        file that previous versions kept for it in the tracking directory.
 
         :param binlog: The binlog file path.
         :returns: The corresponding path to the tracking file.
@@ -449,21 +761,34 @@ AND `T`.`TABLE_NAME` = %s""", (db, table))
 
     def process_binlog(self, binlog):
         """Sweeps through a single binlog, checking it for updates after the
-        last known position read from the tracking file. If new positions are
-        seen, the tracking file is updated with the new position. Queries are
-        processed on the spot and sent to the callback.
+        last known position read from the checkpoint store. If new positions
+        are seen, the checkpoint store is updated with the new position.
+        Queries are processed on the spot and sent to the callback.
+
+        The binlog is read with the ``mysqlbinlog`` command, unless the parser
+        was created with ``native=True``, in which case the events are decoded
+        directly from the binlog file.
 
         :param binlog: The path to the binlog file.
 
         """
-        p = QueryParser(self.callbacks, self.column_names, self.char_sets)
+        last_position = self.get_position(binlog)
+        self.log.info('processing {0} from {1}'.format(binlog, last_position))
 
-        pos_file = self.build_pos_file(binlog)
+        try:
+            if self.native:
+                self._read_native(binlog, last_position)
+            else:
+                self._read_mysqlbinlog(binlog, last_position)
+        except Exception:
+            self.log.exception('Unhandled exception')
+        finally:
+            self._checkpoint(self.checkpoints.flush)
+            self._drain()
 
-        last_position = self.read_position(pos_file)
-        self.log.info('processing {0} from {1}'.format(binlog, last_position))
-        writepos = open(pos_file, 'w')
-        self.write_position(writepos, last_position)
+    def _read_mysqlbinlog(self, binlog, last_position):
+        p = QueryParser(self.callbacks, self.column_names, self.char_sets,
+                        self.column_decoders)
 
         args = ['mysqlbinlog', '-v', '--base64-output=DECODE-ROWS', binlog,
                 '-j', last_position,
@@ -473,53 +798,180 @@ AND `T`.`TABLE_NAME` = %s""", (db, table))
                                 stdout=subprocess.PIPE)
         proc.stdin.close()
 
+        lines = proc.stdout
+        if self.pipeline:
+            lines = self._iter_lines(proc.stdout)
+        committed = False
+        try:
+            for line in lines:
+                if self.done:
+                    break
+                if line.startswith('### '):
+                    p.parse(line[4:].rstrip('\r\n'))
+                elif line.startswith('# at '):
+                    if not p.in_transaction:
+                        last_position = line[5:].rstrip()
+                        self.write_position(binlog, last_position, committed)
+                        committed = False
+                elif not line.startswith('#'):
+                    if p.parse_statement(line.rstrip('\r\n')):
+                        committed = True
+            else:
+                if not self.done:
+                    p.finish()
+        finally:
+            proc.wait()
+
+    def _read_native(self, binlog, last_position):
+        reader = BinlogEventReader(self.callbacks, self.column_names,
+                                   self.char_sets, self.column_types)
+        for position, commit in reader.read(binlog, int(last_position)):
+            self.write_position(binlog, str(position), commit)
+            if self.done:
+                break
+
+    def _get_follow_start(self):
+        binlogs = self.read_index()
+        for binlog in binlogs:
+            position = self.get_position(binlog)
+            if int(position) < os.path.getsize(binlog):
+                return binlog
+        return binlogs[-1]
+
+    def _build_follow_args(self, mysql_info, binlog, position):
+        args = ['mysqlbinlog', '-v', '--base64-output=DECODE-ROWS',
+                '--read-from-remote-server', '--stop-never',
+                '-j', position,
+                '--set-charset=utf8']
+        for key, option in self._follow_options:
+            if key in mysql_info:
+                args.append('{0}={1}'.format(option, mysql_info[key]))
+        args.append(os.path.basename(binlog))
+        if find_executable('stdbuf'):
+            args = ['stdbuf', '-oL'] + args
+        return args
+
+    def _readlines(self, stream):
+        while True:
+            try:
+                line = stream.readline()
+            except IOError as exc:
+                if exc.errno == errno.EINTR and not self.done:
+                    continue
+                elif exc.errno == errno.EINTR:
+                    return
+                raise
+            if not line:
+                return
+            yield line
+
+    def follow_binlogs(self, mysql_info):
+        """Attaches a single long-running ``mysqlbinlog`` process to the MySQL
+        server, starting at the first binlog that has not been fully processed.
+        Unlike :meth:`process_all_binlogs`, events are streamed by the server
+        as they are written, and the process follows the server through binlog
+        rotations. This method only returns when the process exits or the
+        parser is stopped.
+
+        :param mysql_info: Contains the details about the MySQL connection.
+
+        """
+        binlog = self._get_follow_start()
+        last_position = self.get_position(binlog)
+        self.log.info('following {0} from {1}'.format(binlog, last_position))
+
+        p = QueryParser(self.callbacks, self.column_names, self.char_sets,
+                        self.column_decoders)
+
+        env = os.environ.copy()
+        if 'passwd' in mysql_info:
+            env['MYSQL_PWD'] = mysql_info['passwd']
+        args = self._build_follow_args(mysql_info, binlog, last_position)
+        proc = subprocess.Popen(args, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, env=env)
+        proc.stdin.close()
+
+        committed = False
         try:
-            for line in proc.stdout:
+            for line in self._iter_lines(proc.stdout):
                 if self.done:
                     break
                 if line.startswith('### '):
                     p.parse(line[4:].rstrip('\r\n'))
                 elif line.startswith('# at '):
-                    last_position = line[5:].rstrip()
-                    self.write_position(writepos, last_position)
+                    if not p.in_transaction:
+                        last_position = line[5:].rstrip()
+                        self.write_position(binlog, last_position, committed)
+                        committed = False
+                elif not line.startswith('#'):
+                    if p.parse_statement(line.rstrip('\r\n')):
+                        committed = True
+                else:
+                    match = self._rotate_pattern.search(line)
+                    if not match:
+                        continue
+                    p.finish()
+                    next_binlog = os.path.join(os.path.dirname(binlog),
+                                               match.group(1))
+                    if next_binlog != binlog:
+                        self.log.info('following {0}'.format(next_binlog))
+                        binlog = next_binlog
+                    self.write_position(binlog, match.group(2))
             else:
-                p.finish()
+                if not self.done:
+                    p.finish()
         except Exception:
             self.log.exception('Unhandled exception')
         finally:
-            writepos.close()
+            self._checkpoint(self.checkpoints.flush)
+            self._drain()
+            if proc.poll() is None:
+                proc.terminate()
             proc.wait()
 
     def process_all_binlogs(self):
         """Sweeps through all the binlogs in the index. The index is read every
         sweep in case MySQL is restarted or rotates to a new binlog file. This
         method also checks each binlogs mtime to see if it has been modified
-        since the last sweep.
+        since the last sweep. Binlogs that had already been rotated out at the
+        last sweep are not written to again, so they are not checked.
 
         """
         binlogs = self.read_index()
+        active = set(self.binlog_tail + binlogs[-1:])
         for binlog in binlogs:
             if not self.done:
-                old_mtime = self.binlog_mtimes.get(binlog, 0.0)
+                old_mtime = self.binlog_mtimes.get(binlog)
+                if old_mtime is not None and binlog not in active:
+                    continue
                 self.binlog_mtimes[binlog] = float(os.path.getmtime(binlog))
-                if old_mtime < self.binlog_mtimes[binlog]:
+                if (old_mtime or 0.0) < self.binlog_mtimes[binlog]:
                     self.process_binlog(binlog)
+        self.binlog_tail = binlogs[-1:]
+
+    def get_watch_paths(self):
+        """Builds the list of files that should be watched for changes between
+        sweeps, which are the binlog index and the active binlog.
+
+        :returns: List of file paths.
+
+        """
+        return [self.index_file] + self.read_index()[-1:]
 
     def set_binlogpos_at_end(self, binlog):
-        """Manually sets the binlog's position tracking file to the end of the
-        binlog, so that future sweeps will not act upon any existing entries.
+        """Manually sets the binlog's position in the checkpoint store to the
+        end of the binlog, so that future sweeps will not act upon any existing
+        entries.
 
         :param binlog: The file path to the binlog.
 
         """
-        pos_file = self.build_pos_file(binlog)
-
-        old_pos = self.read_position(pos_file)
+        old_pos = self.get_position(binlog)
         binlog_size = os.path.getsize(binlog)
-        with open(pos_file, 'w') as f:
-            self.write_position(f, str(binlog_size))
+        self.write_position(binlog, str(binlog_size))
+        self.checkpoints.flush()
         self.log.info('changing {0} from {1} to {2}'.format(
-            pos_file, old_pos, binlog_size))
+            binlog, old_pos, binlog_size))
 
 
 def confirm_skip_existing():
@@ -561,7 +1013,9 @@ MYGRATE_CONFIG environment variable.
 
     binlog_index, tracking_delay = cfg.get_mysql_binlog_info()
     tracking_dir = cfg.get_tracking_dir()
-    parser = BinlogParser(binlog_index, tracking_dir, None)
+    checkpoints = CheckpointStore(tracking_dir, **cfg.get_checkpoint_info())
+    parser = BinlogParser(binlog_index, tracking_dir, None,
+                          checkpoints=checkpoints)
     binlogs = parser.read_index()
     for binlog in binlogs:
         parser.set_binlogpos_at_end(binlog)
@@ -574,8 +1028,10 @@ def main():
     """
     description = """\
 This program follows changes in the MySQL binlog, producing job tasks for each
-change. It is intended to be long-running, and will briefly pause after
-catching up each binlog before checking for new changes.
+change. It is intended to be long-running, and after catching up each binlog
+will wait for the binlog index or the active binlog to change before checking
+for new changes. With --follow, a single mysqlbinlog command instead streams
+changes from the server as they are written.
 
 Configuration for %prog is done with configuration files. This is either
 /etc/mygrate.ini, ~/.mygrate.ini, or an alternative specified by the
@@ -586,18 +1042,44 @@ MYGRATE_CONFIG environment variable.
                   help='Daemonize the process before binlog tracking begins')
     op.add_option('-p', '--pid-file', metavar='FILE',
                   help='Write the process ID to FILE')
+    op.add_option('-n', '--native', action='store_true', default=False,
+                  help='Decode binlog files directly, instead of with the '
+                  'mysqlbinlog command.')
+    op.add_option('-f', '--follow', action='store_true', default=False,
+                  help='Stream events from the MySQL server with a single '
+                  'long-running mysqlbinlog command.')
+    op.add_option('-w', '--workers', type='int', default=0, metavar='NUM',
+                  help='Run callbacks on NUM worker threads. Changes to the '
+                  'same row are still run in order.')
+    op.add_option('-c', '--concurrency', type='int', default=0, metavar='NUM',
+                  help='Run callbacks on an event loop, with up to NUM in '
+                  'flight at once. Callbacks may be coroutine functions, and '
+                  'changes to the same row are still finished in order.')
+    op.add_option('--pipeline', action='store_true', default=False,
+                  help='Read, parse, and run callbacks for binlog events on '
+                  'separate threads joined by bounded queues.')
     options, _ = op.parse_args()
+    if options.native and options.follow:
+        op.error('--native and --follow may not be used together')
+    if options.workers and options.concurrency:
+        op.error('--workers and --concurrency may not be used together')
 
     from .config import cfg
     from .callbacks import MygrateCallbacks
     from .daemon import daemonize, redirect_stdio, PidFile
+    from .watch import get_watcher
 
     callbacks = MygrateCallbacks()
     tracking_dir = cfg.get_tracking_dir()
     binlog_index, tracking_delay = cfg.get_mysql_binlog_info()
     cfg.call_entry_point(callbacks)
 
-    parser = BinlogParser(binlog_index, tracking_dir, callbacks)
+    checkpoints = CheckpointStore(tracking_dir, **cfg.get_checkpoint_info())
+    parser = BinlogParser(binlog_index, tracking_dir, callbacks,
+                          native=options.native, checkpoints=checkpoints,
+                          workers=options.workers,
+                          pipeline=options.pipeline,
+                          concurrency=options.concurrency)
 
     def graceful_quit(sig, frame):
         parser.done = True
@@ -614,10 +1096,24 @@ MYGRATE_CONFIG environment variable.
         redirect_stdio()
 
     with PidFile(options.pid_file):
-        while not parser.done:
-            parser.process_all_binlogs()
-            if not parser.done:
-                sleep(tracking_delay)
+        try:
+            if options.follow:
+                while not parser.done:
+                    parser.follow_binlogs(mysql_info)
+                    if not parser.done:
+                        sleep(tracking_delay)
+            else:
+                watcher = get_watcher(max_delay=tracking_delay)
+                try:
+                    while not parser.done:
+                        watcher.watch(parser.get_watch_paths())
+                        parser.process_all_binlogs()
+                        while not parser.done and not watcher.wait():
+                            pass
+                finally:
+                    watcher.close()
+        finally:
+            parser.close()
 
 
 if __name__ == '__main__':
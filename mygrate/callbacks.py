@@ -29,13 +29,17 @@ class MygrateCallbacks(object):
 
     def __init__(self):
         self.callbacks = {}
+        self.transaction_callbacks = []
         self.error_handler = self._default_error_handler
 
     def _default_error_handler(self, table, action, args, kwargs):
         raise
 
     def get_registered_tables(self):
-        return self.callbacks.keys()
+        tables = set(self.callbacks.keys())
+        for callback_tables, callback in self.transaction_callbacks:
+            tables.update(callback_tables)
+        return list(tables)
 
     def register_error_handler(self, handler):
         """Registers an error handler for all registered callbacks. When
@@ -64,16 +68,64 @@ class MygrateCallbacks(object):
         self.callbacks.setdefault(table, {})
         self.callbacks[table][action] = callback
 
+    def register_transaction(self, tables, callback):
+        """Registers a callback for committed transactions that change any of
+        the given tables. The callback is called once per transaction, after
+        the callbacks for the individual rows, with a list of ``(table,
+        action, args)`` tuples for every change in the transaction, in order.
+
+        If a transaction callback raises an exception, the error handler is
+        called with ``None`` as the table, ``'TRANSACTION'`` as the action, and
+        the list of changes as the only positional argument.
+
+        :param tables: The tables the callback should apply to.
+        :param callback: The function to call when a transaction is committed.
+
+        """
+        self.transaction_callbacks.append((frozenset(tables), callback))
+
+    def get_callback(self, table, action):
+        """Finds the callback registered for an action on a table.
+
+        :param table: The table the action happened on.
+        :param action: The action that happened.
+        :returns: The callback function, or None.
+
+        """
+        return self.callbacks.get(table, {}).get(action)
+
+    def get_transaction_callbacks(self, changes):
+        """Finds the transaction callbacks that apply to the changes in a
+        transaction.
+
+        :param changes: List of ``(table, action, args)`` tuples.
+        :returns: List of callbacks paired with the changes they apply to.
+
+        """
+        ret = []
+        for tables, callback in self.transaction_callbacks:
+            relevant = [change for change in changes if change[0] in tables]
+            if relevant:
+                ret.append((callback, relevant))
+        return ret
+
     def execute(self, table, action, *args, **kwargs):
-        if table not in self.callbacks:
-            return
-        if action not in self.callbacks[table]:
+        callback = self.get_callback(table, action)
+        if callback is None:
             return
-        callback = self.callbacks[table][action]
         try:
-            callback(table, *args, **kwargs)
+            return callback(table, *args, **kwargs)
         except Exception:
             self.error_handler(table, action, args, kwargs)
 
+    def execute_transaction(self, changes):
+        for table, action, args in changes:
+            self.execute(table, action, *args)
+        for callback, relevant in self.get_transaction_callbacks(changes):
+            try:
+                callback(relevant)
+            except Exception:
+                self.error_handler(None, 'TRANSACTION', (relevant, ), {})
+
 
 # vim:et:fdm=marker:sts=4:sw=4:ts=4
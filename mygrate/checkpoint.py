@@ -0,0 +1,160 @@
+# Copyright (c) 2013 Ian C. Good
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+from __future__ import absolute_import
+
+import os
+import os.path
+import json
+import time
+import errno
+import tempfile
+
+__all__ = ['CheckpointStore', 'atomic_write']
+
+
+def atomic_write(path, data, fsync=False):
+    """Replaces the contents of a file without ever leaving it partially
+    written, by writing to a temporary file in the same directory and renaming
+    it over the original.
+
+    :param path: The file path to write.
+    :param data: The new contents of the file.
+    :param fsync: If True, the data and the rename are flushed to disk before
+                  returning.
+
+    """
+    dirname = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=dirname,
+                                    prefix='.' + os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.rename(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    if fsync:
+        dir_fd = os.open(dirname, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class CheckpointStore(object):
+    """Keeps the latest processed position of every binlog in a single file
+    in the tracking directory. Positions are updated in memory as events are
+    processed, and written to disk according to a flush policy. If no policy
+    is given, every update is written.
+
+    :param tracking_dir: The directory to keep the checkpoint file in.
+    :param flush_events: Write to disk after this many updates.
+    :param flush_interval: Write to disk when this many seconds have passed
+                           since the last write.
+    :param flush_on_commit: Write to disk when an update marks the end of a
+                            transaction.
+    :param fsync: Flush writes all the way to disk with ``fsync()``.
+    :param filename: The name of the checkpoint file.
+
+    """
+
+    def __init__(self, tracking_dir, flush_events=None, flush_interval=None,
+                 flush_on_commit=False, fsync=False,
+                 filename='binlogpos.json'):
+        self.path = os.path.join(tracking_dir, filename)
+        self.flush_events = flush_events
+        self.flush_interval = flush_interval
+        self.flush_on_commit = flush_on_commit
+        self.fsync = fsync
+        self.flush_always = (flush_events is None and
+                             flush_interval is None and
+                             not flush_on_commit)
+        self.positions = self._load()
+        self.dirty = False
+        self.pending = 0
+        self.last_flush = time.time()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except IOError as exc:
+            if exc.errno != errno.ENOENT:
+                raise
+        return {}
+
+    def _get_key(self, binlog):
+        return os.path.basename(binlog)
+
+    def get(self, binlog, default=None):
+        """Gets the last known position of a binlog.
+
+        :param binlog: The binlog file path.
+        :param default: Returned if there is no position for the binlog.
+        :returns: The position string.
+
+        """
+        return self.positions.get(self._get_key(binlog), default)
+
+    def update(self, binlog, position, commit=False):
+        """Updates the position of a binlog, writing the checkpoint file to
+        disk if the flush policy calls for it.
+
+        :param binlog: The binlog file path.
+        :param position: The new position string.
+        :param commit: True if the position is at the end of a transaction.
+
+        """
+        self.positions[self._get_key(binlog)] = position
+        self.dirty = True
+        self.pending += 1
+        if self.flush_always:
+            self.flush()
+        elif commit and self.flush_on_commit:
+            self.flush()
+        elif self.flush_events and self.pending >= self.flush_events:
+            self.flush()
+        elif self.flush_interval is not None and \
+                time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Writes the checkpoint file to disk, if any positions have changed
+        since it was last written.
+
+        """
+        if not self.dirty:
+            return
+        data = json.dumps(self.positions, sort_keys=True, indent=0)
+        atomic_write(self.path, data, self.fsync)
+        self.dirty = False
+        self.pending = 0
+        self.last_flush = time.time()
+
+
+# vim:et:fdm=marker:sts=4:sw=4:ts=4
@@ -94,6 +94,29 @@ class MygrateConfig(object):
             delay = 1.0
         return index_file, float(delay)
 
+    def get_checkpoint_info(self):
+        """Gets the flush policy of the binlog checkpoint store. By default,
+        checkpoints are written to disk once a second.
+
+        :returns: Dict of keyword arguments for
+                  :class:`~mygrate.checkpoint.CheckpointStore`.
+
+        """
+        ret = {'flush_interval': 1.0}
+        getters = [('flush_events', 'checkpoint_events',
+                    self.parser.getint),
+                   ('flush_interval', 'checkpoint_interval',
+                    self.parser.getfloat),
+                   ('flush_on_commit', 'checkpoint_on_commit',
+                    self.parser.getboolean),
+                   ('fsync', 'checkpoint_fsync', self.parser.getboolean)]
+        for key, option, getter in getters:
+            try:
+                ret[key] = getter(self.section, option)
+            except (NoSectionError, NoOptionError):
+                pass
+        return ret
+
     def get_tracking_dir(self):
         try:
             tracking_dir = self.parser.get(self.section, 'tracking_dir')
@@ -0,0 +1,268 @@
+# Copyright (c) 2013 Ian C. Good
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+from __future__ import absolute_import
+
+import sys
+import threading
+
+try:
+    import asyncio
+except ImportError:
+    try:
+        import trollius as asyncio
+    except ImportError:
+        asyncio = None
+
+from .exceptions import MygrateError
+from .dispatch import Watermark, Dispatcher
+
+__all__ = ['CoroutineRunner', 'CoroutineDispatcher']
+
+
+class CoroutineRunner(object):
+    """Runs an :mod:`asyncio` event loop on a background thread, and calls
+    functions submitted from other threads on it. If a function returns a
+    coroutine or future, it is run on the loop and counts as in flight until
+    it finishes. At most ``concurrency`` functions are in flight at once, and
+    :meth:`submit` blocks the calling thread until one finishes.
+
+    Functions submitted with a key only start once every function submitted
+    earlier with the same key has finished, so they finish in order. Functions
+    with different keys run concurrently.
+
+    :param concurrency: The most functions that may be in flight at once.
+
+    """
+
+    def __init__(self, concurrency=100):
+        if asyncio is None:
+            raise MygrateError('asyncio or trollius is required')
+        self.loop = asyncio.new_event_loop()
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.watermark = Watermark()
+        self.tails = {}
+        self.idle = threading.Condition()
+        self.in_flight = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.loop.close()
+
+    def submit(self, keys, on_error, func, *args):
+        """Calls ``func`` with ``args`` on the event loop.
+
+        :param keys: The keys to order the function by.
+        :param on_error: Called within the scope of the exception if ``func``
+                         raises or its coroutine fails. If this raises in
+                         turn, the exception is raised again from the next
+                         call made on the runner.
+        :param func: The function to call.
+
+        """
+        self._check_error()
+        self.slots.acquire()
+        with self.idle:
+            self.in_flight += 1
+        seq = self.watermark.issue()
+        self.loop.call_soon_threadsafe(self._chain, keys, seq, on_error,
+                                       func, args)
+
+    def _chain(self, keys, seq, on_error, func, args):
+        done = asyncio.Future(loop=self.loop)
+        previous = []
+        for key in keys:
+            tail = self.tails.get(key)
+            if tail is not None and not tail.done():
+                previous.append(tail)
+            self.tails[key] = done
+        waiting = [len(previous)]
+
+        def start(future=None):
+            waiting[0] -= 1
+            if waiting[0] <= 0:
+                self._start(keys, seq, done, on_error, func, args)
+        if not previous:
+            start()
+        for tail in previous:
+            tail.add_done_callback(start)
+
+    def _start(self, keys, seq, done, on_error, func, args):
+        if self.error is not None:
+            self._finish(keys, seq, done)
+            return
+        try:
+            result = func(*args)
+        except Exception:
+            self._handle_error(on_error)
+            self._finish(keys, seq, done)
+            return
+        if asyncio.iscoroutine(result) or isinstance(result, asyncio.Future):
+            task = asyncio.ensure_future(result, loop=self.loop)
+            task.add_done_callback(lambda task: self._finish(
+                keys, seq, done, on_error, task))
+        else:
+            self._finish(keys, seq, done, success=True)
+
+    def _handle_error(self, on_error):
+        try:
+            on_error()
+        except Exception:
+            self.error = sys.exc_info()
+
+    def _finish(self, keys, seq, done, on_error=None, task=None,
+                success=False):
+        try:
+            if task is not None:
+                exc = task.exception()
+                if exc is None:
+                    success = True
+                else:
+                    try:
+                        raise exc
+                    except Exception:
+                        self._handle_error(on_error)
+            if success:
+                self.watermark.complete(seq)
+        except Exception:
+            self.error = sys.exc_info()
+        finally:
+            done.set_result(None)
+            for key in keys:
+                if self.tails.get(key) is done:
+                    del self.tails[key]
+            self.slots.release()
+            with self.idle:
+                self.in_flight -= 1
+                self.idle.notify_all()
+
+    def _check_error(self):
+        if self.error is not None:
+            self._wait_idle()
+            error, self.error = self.error, None
+            self.watermark = Watermark()
+            raise error[0], error[1], error[2]
+
+    def _wait_idle(self):
+        with self.idle:
+            while self.in_flight:
+                self.idle.wait(0.5)
+
+    def defer(self, func, *args):
+        """Calls ``func`` with ``args`` once every function submitted so far
+        has finished.
+
+        :param func: The function to call.
+
+        """
+        self._check_error()
+        self.watermark.defer(func, *args)
+
+    def wait(self):
+        """Waits for every submitted function to finish.
+
+        """
+        self._wait_idle()
+        self._check_error()
+
+    def close(self):
+        """Waits for every submitted function to finish, and then stops the
+        event loop.
+
+        """
+        try:
+            self.wait()
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+
+class CoroutineDispatcher(Dispatcher):
+    """Wraps a :class:`~mygrate.callbacks.MygrateCallbacks` object so that
+    callbacks are run by a :class:`CoroutineRunner`. Callbacks may be plain
+    functions or coroutine functions, and callbacks for changes to the same
+    row are finished in order while up to ``concurrency`` others are in
+    flight. A transaction callback waits for every row in the transaction.
+
+    :param callbacks: The callbacks to execute.
+    :param primary_keys: Dict of table names to their primary key columns.
+    :param concurrency: The most callbacks that may be in flight at once.
+
+    """
+
+    def __init__(self, callbacks, primary_keys=None, concurrency=100):
+        self.callbacks = callbacks
+        self.primary_keys = primary_keys if primary_keys is not None else {}
+        self.runner = CoroutineRunner(concurrency)
+
+    def _on_error(self, table, action, args):
+        return lambda: self.callbacks.error_handler(table, action, args, {})
+
+    def execute(self, table, action, *args):
+        callback = self.callbacks.get_callback(table, action)
+        if callback is None:
+            return
+        keys = self._get_keys(table, action, args)
+        self.runner.submit(keys, self._on_error(table, action, args),
+                           callback, table, *args)
+
+    def execute_transaction(self, changes):
+        for table, action, args in changes:
+            self.execute(table, action, *args)
+        for callback, relevant in \
+                self.callbacks.get_transaction_callbacks(changes):
+            keys = []
+            for table, action, args in relevant:
+                keys.extend(self._get_keys(table, action, args))
+            self.runner.submit(keys,
+                               self._on_error(None, 'TRANSACTION',
+                                              (relevant, )),
+                               callback, relevant)
+
+    def checkpoint(self, func, *args):
+        """Calls ``func`` with ``args`` once every callback executed so far
+        has finished.
+
+        :param func: The function to call, usually to store a binlog position.
+
+        """
+        self.runner.defer(func, *args)
+
+    def wait(self):
+        """Waits for all the callbacks in flight to finish.
+
+        """
+        self.runner.wait()
+
+    def close(self):
+        """Waits for all the callbacks in flight to finish, and then stops the
+        event loop.
+
+        """
+        self.runner.close()
+
+
+# vim:et:fdm=marker:sts=4:sw=4:ts=4
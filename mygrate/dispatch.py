@@ -0,0 +1,220 @@
+# Copyright (c) 2013 Ian C. Good
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+from __future__ import absolute_import
+
+import sys
+import threading
+import Queue
+from collections import deque
+
+__all__ = ['Watermark', 'Dispatcher']
+
+
+class Watermark(object):
+    """Tracks the changes that have been handed to workers but not yet
+    finished. Functions deferred with :meth:`defer` are called, in order, once
+    every change issued before them has been completed, which is how
+    checkpoints are kept from advancing past unfinished work.
+
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_seq = 0
+        self.pending = set()
+        self.deferred = deque()
+
+    def issue(self):
+        """Issues a sequence number for a new change.
+
+        :returns: The sequence number to pass to :meth:`complete`.
+
+        """
+        with self.lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            self.pending.add(seq)
+            return seq
+
+    def complete(self, seq):
+        """Marks a change as finished, calling any deferred functions that
+        were only waiting on it.
+
+        :param seq: The sequence number from :meth:`issue`.
+
+        """
+        with self.lock:
+            self.pending.discard(seq)
+            self._run_ready()
+
+    def defer(self, func, *args):
+        """Calls ``func`` with ``args`` once every change issued so far has
+        been completed, which may be immediately.
+
+        :param func: The function to call.
+
+        """
+        with self.lock:
+            self.deferred.append((self.next_seq, func, args))
+            self._run_ready()
+
+    def _run_ready(self):
+        low = min(self.pending) if self.pending else self.next_seq
+        while self.deferred and self.deferred[0][0] <= low:
+            _, func, args = self.deferred.popleft()
+            func(*args)
+
+
+class Dispatcher(object):
+    """Wraps a :class:`~mygrate.callbacks.MygrateCallbacks` object so that
+    callbacks are executed on a pool of worker threads. Changes are assigned to
+    a worker by hashing their table and primary key, so changes to the same row
+    are executed in order while changes to other rows proceed in parallel.
+
+    Changes that cannot be assigned to a single worker, such as an update that
+    changes the primary key or a transaction that touches rows on several
+    workers, wait for all the workers to finish and are then executed on the
+    calling thread. Tables without a known primary key are assigned by table
+    name alone.
+
+    If a callback raises an exception, the exception is raised again from the
+    next call made on the dispatcher, and no later checkpoints are run.
+
+    :param callbacks: The callbacks to execute.
+    :param primary_keys: Dict of table names to their primary key columns.
+    :param workers: The number of worker threads.
+    :param queue_size: The number of changes that may wait on each worker
+                       before the calling thread is blocked.
+
+    """
+
+    def __init__(self, callbacks, primary_keys=None, workers=4,
+                 queue_size=1000):
+        self.callbacks = callbacks
+        self.primary_keys = primary_keys if primary_keys is not None else {}
+        self.watermark = Watermark()
+        self.error = None
+        self.queues = [Queue.Queue(queue_size) for i in range(workers)]
+        self.threads = []
+        for queue in self.queues:
+            thread = threading.Thread(target=self._work, args=(queue, ))
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def __getattr__(self, name):
+        return getattr(self.callbacks, name)
+
+    def _work(self, queue):
+        while True:
+            item = queue.get()
+            try:
+                if item is None:
+                    return
+                seq, func, args = item
+                if self.error is not None:
+                    continue
+                try:
+                    func(*args)
+                    self.watermark.complete(seq)
+                except Exception:
+                    self.error = sys.exc_info()
+            finally:
+                queue.task_done()
+
+    def _get_key(self, table, row):
+        columns = self.primary_keys.get(table)
+        if not columns:
+            return table
+        return table, tuple([row.get(column) for column in columns])
+
+    def _get_keys(self, table, action, args):
+        keys = [self._get_key(table, args[0])]
+        if action == 'UPDATE' and len(args) > 1:
+            keys.append(self._get_key(table, args[1]))
+        return keys
+
+    def _get_queue(self, keys):
+        queues = set([hash(key) % len(self.queues) for key in keys])
+        if len(queues) == 1:
+            return self.queues[queues.pop()]
+
+    def _submit(self, keys, func, *args):
+        self._check_error()
+        queue = self._get_queue(keys)
+        if queue is None:
+            self.wait()
+            func(*args)
+        else:
+            queue.put((self.watermark.issue(), func, args))
+
+    def _check_error(self):
+        if self.error is not None:
+            for queue in self.queues:
+                queue.join()
+            error, self.error = self.error, None
+            self.watermark = Watermark()
+            raise error[0], error[1], error[2]
+
+    def execute(self, table, action, *args):
+        keys = self._get_keys(table, action, args)
+        self._submit(keys, self.callbacks.execute, table, action, *args)
+
+    def execute_transaction(self, changes):
+        keys = []
+        for table, action, args in changes:
+            keys.extend(self._get_keys(table, action, args))
+        self._submit(keys, self.callbacks.execute_transaction, changes)
+
+    def checkpoint(self, func, *args):
+        """Calls ``func`` with ``args`` once every change executed so far has
+        finished.
+
+        :param func: The function to call, usually to store a binlog position.
+
+        """
+        self._check_error()
+        self.watermark.defer(func, *args)
+
+    def wait(self):
+        """Waits for all the workers to finish their changes.
+
+        """
+        for queue in self.queues:
+            queue.join()
+        self._check_error()
+
+    def close(self):
+        """Waits for all the workers to finish their changes, and then stops
+        them.
+
+        """
+        try:
+            self.wait()
+        finally:
+            for queue in self.queues:
+                queue.put(None)
+            for thread in self.threads:
+                thread.join()
+
+
+# vim:et:fdm=marker:sts=4:sw=4:ts=4
@@ -0,0 +1,523 @@
+# Copyright (c) 2013 Ian C. Good
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+from __future__ import absolute_import
+
+import os
+import mmap
+import time
+import struct
+from datetime import datetime
+
+import bitstring
+
+from .exceptions import MygrateError
+
+__all__ = ['BinlogFormatError', 'BinlogEventReader']
+
+_magic = '\xfebin'
+_header = struct.Struct('<IBIIIH')
+
+# Event type codes, from libbinlogevents and sql/log_event.h.
+QUERY_EVENT = 2
+FORMAT_DESCRIPTION_EVENT = 15
+XID_EVENT = 16
+TABLE_MAP_EVENT = 19
+WRITE_ROWS_EVENT_V1 = 23
+UPDATE_ROWS_EVENT_V1 = 24
+DELETE_ROWS_EVENT_V1 = 25
+WRITE_ROWS_EVENT = 30
+UPDATE_ROWS_EVENT = 31
+DELETE_ROWS_EVENT = 32
+
+_rows_events = {WRITE_ROWS_EVENT_V1: 'INSERT',
+                UPDATE_ROWS_EVENT_V1: 'UPDATE',
+                DELETE_ROWS_EVENT_V1: 'DELETE',
+                WRITE_ROWS_EVENT: 'INSERT',
+                UPDATE_ROWS_EVENT: 'UPDATE',
+                DELETE_ROWS_EVENT: 'DELETE'}
+
+_stmt_end_flag = 0x0001
+
+# Column type codes, from include/mysql_com.h.
+TYPE_DECIMAL = 0
+TYPE_TINY = 1
+TYPE_SHORT = 2
+TYPE_LONG = 3
+TYPE_FLOAT = 4
+TYPE_DOUBLE = 5
+TYPE_NULL = 6
+TYPE_TIMESTAMP = 7
+TYPE_LONGLONG = 8
+TYPE_INT24 = 9
+TYPE_DATE = 10
+TYPE_TIME = 11
+TYPE_DATETIME = 12
+TYPE_YEAR = 13
+TYPE_NEWDATE = 14
+TYPE_VARCHAR = 15
+TYPE_BIT = 16
+TYPE_TIMESTAMP2 = 17
+TYPE_DATETIME2 = 18
+TYPE_TIME2 = 19
+TYPE_JSON = 245
+TYPE_NEWDECIMAL = 246
+TYPE_ENUM = 247
+TYPE_SET = 248
+TYPE_TINY_BLOB = 249
+TYPE_MEDIUM_BLOB = 250
+TYPE_LONG_BLOB = 251
+TYPE_BLOB = 252
+TYPE_VAR_STRING = 253
+TYPE_STRING = 254
+TYPE_GEOMETRY = 255
+
+_int_formats = {TYPE_TINY: ('<b', '<B', 1),
+                TYPE_SHORT: ('<h', '<H', 2),
+                TYPE_LONG: ('<i', '<I', 4),
+                TYPE_LONGLONG: ('<q', '<Q', 8)}
+
+_dig2bytes = [0, 1, 1, 2, 2, 3, 3, 4, 4, 4]
+
+
+class BinlogFormatError(MygrateError):
+    """The binlog file could not be decoded."""
+    pass
+
+
+class TableMap(object):
+    """Holds the information from a ``TABLE_MAP_EVENT``, which describes the
+    columns of a table for the row events that follow it.
+
+    """
+
+    __slots__ = ['table', 'types', 'meta', 'unsigned']
+
+    def __init__(self, table, types, meta, unsigned):
+        self.table = table
+        self.types = types
+        self.meta = meta
+        self.unsigned = unsigned
+
+
+def _read_lenenc(data, pos):
+    first = ord(data[pos])
+    if first < 251:
+        return first, pos + 1
+    elif first == 252:
+        return struct.unpack_from('<H', data, pos + 1)[0], pos + 3
+    elif first == 253:
+        low, high = struct.unpack_from('<HB', data, pos + 1)
+        return low | (high << 16), pos + 4
+    elif first == 254:
+        return struct.unpack_from('<Q', data, pos + 1)[0], pos + 9
+    raise BinlogFormatError('Invalid length-encoded integer')
+
+
+def _read_uint_le(data, pos, size):
+    ret = 0
+    for i in range(size):
+        ret |= ord(data[pos + i]) << (8 * i)
+    return ret
+
+
+def _read_uint_be(data, pos, size):
+    ret = 0
+    for i in range(size):
+        ret = (ret << 8) | ord(data[pos + i])
+    return ret
+
+
+def _bitmap_bits(data, pos, count):
+    bits = []
+    for i in range(count):
+        bits.append(bool(ord(data[pos + (i >> 3)]) & (1 << (i & 7))))
+    return bits
+
+
+def _read_frac(data, pos, fsp):
+    size = (fsp + 1) // 2
+    if not size:
+        return 0, pos
+    frac = _read_uint_be(data, pos, size)
+    return frac * (10 ** (6 - 2 * size)), pos + size
+
+
+def _decimal_size(precision, scale):
+    integral = precision - scale
+    return ((integral // 9) * 4 + _dig2bytes[integral % 9] +
+            (scale // 9) * 4 + _dig2bytes[scale % 9])
+
+
+def _read_decimal(data, pos, precision, scale):
+    integral = precision - scale
+    size = _decimal_size(precision, scale)
+    raw = bytearray(data[pos:pos + size])
+    negative = not raw[0] & 0x80
+    raw[0] ^= 0x80
+    if negative:
+        raw = bytearray([b ^ 0xff for b in raw])
+    groups = ([integral % 9] + [9] * (integral // 9) +
+              [9] * (scale // 9) + [scale % 9])
+    digits = []
+    i = 0
+    for num_digits in groups:
+        value = 0
+        for b in raw[i:i + _dig2bytes[num_digits]]:
+            value = (value << 8) | b
+        i += _dig2bytes[num_digits]
+        if num_digits:
+            digits.append(str(value).zfill(num_digits))
+    text = ''.join(digits)
+    if scale:
+        text = '{0}.{1}'.format(text[:-scale] or '0', text[-scale:])
+    if negative:
+        text = '-' + text
+    return float(text), pos + size
+
+
+def _parse_string_meta(meta):
+    real_type, length = meta >> 8, meta & 0xff
+    if real_type not in (TYPE_ENUM, TYPE_SET) and \
+            (real_type & 0x30) != 0x30:
+        length |= ((real_type & 0x30) ^ 0x30) << 4
+        real_type |= 0x30
+    return real_type, length
+
+
+def _time_struct(hour, minute, second):
+    try:
+        return time.strptime('{0:02d}:{1:02d}:{2:02d}'.format(
+            hour, minute, second), '%H:%M:%S')
+    except ValueError:
+        return None
+
+
+def _datetime_or_none(*args):
+    try:
+        return datetime(*args)
+    except ValueError:
+        return None
+
+
+class BinlogEventReader(object):
+    """Decodes ROW format events directly from a binlog file, without the help
+    of the ``mysqlbinlog`` command. The file is mapped into memory and the
+    ``TABLE_MAP`` and ``WRITE_ROWS``, ``UPDATE_ROWS``, and ``DELETE_ROWS``
+    events are decoded into the same column dicts produced by
+    :class:`~mygrate.binlog.QueryParser`, which are passed to the callbacks.
+
+    String values are given as the raw bytes from the binlog, before the
+    escaping applied by ``mysqlbinlog``, and are decoded with the table
+    character set if one is known.
+
+    """
+
+    def __init__(self, callbacks, column_names, char_sets, column_types=None):
+        self.callbacks = callbacks
+        self.column_names = column_names
+        self.char_sets = char_sets
+        self.column_types = column_types or {}
+        self.tables = {}
+        self.transaction = None
+        self.checksum_len = 0
+        self.post_header_lens = ''
+
+    def read(self, binlog, start=4):
+        """Reads the binlog file, starting at the given position, and yields
+        the position after each event that completes a statement outside of a
+        transaction, along with whether the event committed a transaction.
+        Callbacks are executed for row events before the position is yielded,
+        and the row events of a transaction are held until it is committed.
+
+        :param binlog: The path to the binlog file.
+        :param start: The position to start reading events from.
+
+        """
+        with open(binlog, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= len(_magic):
+                return
+            data = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            try:
+                for position, commit in self._read_events(data, size, start):
+                    yield position, commit
+            finally:
+                data.close()
+                self.transaction = None
+
+    def _read_events(self, data, size, start):
+        if data[0:4] != _magic:
+            raise BinlogFormatError('Invalid binlog file header')
+        pos = 4
+        while pos + _header.size <= size:
+            timestamp, type_code, server_id, event_size, log_pos, flags = \
+                _header.unpack_from(data, pos)
+            end = pos + event_size
+            if event_size < _header.size or end > size:
+                break
+            body = pos + _header.size
+            if type_code == FORMAT_DESCRIPTION_EVENT:
+                self._handle_format_description(data, body, end)
+                if pos < start:
+                    pos = start
+                    continue
+            elif pos >= start:
+                body_end = end - self.checksum_len
+                if type_code == TABLE_MAP_EVENT:
+                    self._handle_table_map(data, body, body_end)
+                elif type_code in _rows_events:
+                    stmt_end = self._handle_rows(data, type_code, body,
+                                                 body_end)
+                    if stmt_end and self.transaction is None:
+                        yield end, False
+                elif type_code == QUERY_EVENT:
+                    query = self._read_query(data, body, body_end)
+                    if query == 'BEGIN':
+                        self.transaction = []
+                    elif self.transaction is not None and \
+                            query in ('COMMIT', 'ROLLBACK'):
+                        self._commit()
+                        yield end, True
+                    elif self.transaction is None:
+                        yield end, False
+                elif type_code == XID_EVENT:
+                    if self.transaction is not None:
+                        self._commit()
+                    yield end, True
+                elif self.transaction is None:
+                    yield end, False
+            pos = end
+
+    def _commit(self):
+        changes, self.transaction = self.transaction, None
+        if changes:
+            self.callbacks.execute_transaction(changes)
+
+    def _execute(self, table, action, *args):
+        if self.transaction is None:
+            self.callbacks.execute(table, action, *args)
+        else:
+            self.transaction.append((table, action, args))
+
+    def _get_post_header_len(self, type_code, default):
+        if type_code <= len(self.post_header_lens):
+            return ord(self.post_header_lens[type_code - 1])
+        return default
+
+    def _read_table_id(self, data, pos, type_code):
+        if self._get_post_header_len(type_code, 8) == 6:
+            return struct.unpack_from('<I', data, pos)[0], pos + 4
+        return _read_uint_le(data, pos, 6), pos + 6
+
+    def _handle_format_description(self, data, pos, end):
+        server_version = data[pos + 2:pos + 52].rstrip('\0')
+        version = []
+        for part in server_version.split('-', 1)[0].split('.')[:3]:
+            try:
+                version.append(int(part))
+            except ValueError:
+                version.append(0)
+        lens_start = pos + 57
+        if tuple(version) >= (5, 6, 1):
+            checksum_alg = ord(data[end - 5])
+            self.checksum_len = 4 if checksum_alg == 1 else 0
+            self.post_header_lens = data[lens_start:end - 5]
+        else:
+            self.checksum_len = 0
+            self.post_header_lens = data[lens_start:end]
+
+    def _read_query(self, data, pos, end):
+        post_header_len = self._get_post_header_len(QUERY_EVENT, 13)
+        db_len = ord(data[pos + 8])
+        status_vars_len = struct.unpack_from('<H', data, pos + 11)[0]
+        pos += post_header_len + status_vars_len + db_len + 1
+        return data[pos:end].strip()
+
+    def _handle_table_map(self, data, pos, end):
+        table_id, pos = self._read_table_id(data, pos, TABLE_MAP_EVENT)
+        pos += 2
+        db_len = ord(data[pos])
+        db = data[pos + 1:pos + 1 + db_len]
+        pos += db_len + 2
+        table_len = ord(data[pos])
+        table = data[pos + 1:pos + 1 + table_len]
+        pos += table_len + 2
+        num_cols, pos = _read_lenenc(data, pos)
+        types = [ord(c) for c in data[pos:pos + num_cols]]
+        pos += num_cols
+        meta_len, pos = _read_lenenc(data, pos)
+        meta = []
+        for col_type in types:
+            if col_type in (TYPE_FLOAT, TYPE_DOUBLE, TYPE_BLOB, TYPE_GEOMETRY,
+                            TYPE_JSON, TYPE_TIMESTAMP2, TYPE_DATETIME2,
+                            TYPE_TIME2):
+                meta.append(ord(data[pos]))
+                pos += 1
+            elif col_type in (TYPE_VARCHAR, TYPE_VAR_STRING):
+                meta.append(struct.unpack_from('<H', data, pos)[0])
+                pos += 2
+            elif col_type in (TYPE_NEWDECIMAL, TYPE_STRING, TYPE_ENUM,
+                              TYPE_SET, TYPE_BIT):
+                meta.append((ord(data[pos]) << 8) | ord(data[pos + 1]))
+                pos += 2
+            else:
+                meta.append(0)
+        full_table = '{0}.{1}'.format(db, table)
+        unsigned = [False] * num_cols
+        for i, types_entry in enumerate(self.column_types.get(full_table,
+                                                              [])[:num_cols]):
+            unsigned[i] = 'unsigned' in types_entry[1].lower()
+        self.tables[table_id] = TableMap(full_table, types, meta, unsigned)
+
+    def _handle_rows(self, data, type_code, pos, end):
+        table_id, pos = self._read_table_id(data, pos, type_code)
+        flags = struct.unpack_from('<H', data, pos)[0]
+        pos += 2
+        if type_code >= WRITE_ROWS_EVENT:
+            extra_len = struct.unpack_from('<H', data, pos)[0]
+            pos += extra_len
+        table_map = self.tables.get(table_id)
+        if table_map is None:
+            return flags & _stmt_end_flag
+        table = table_map.table
+        if table not in self.callbacks.get_registered_tables():
+            return flags & _stmt_end_flag
+        action = _rows_events[type_code]
+        num_cols, pos = _read_lenenc(data, pos)
+        bitmap_len = (num_cols + 7) // 8
+        present = _bitmap_bits(data, pos, num_cols)
+        pos += bitmap_len
+        if action == 'UPDATE':
+            present_after = _bitmap_bits(data, pos, num_cols)
+            pos += bitmap_len
+        names = self.column_names[table]
+        char_set = self.char_sets.get(table)
+        while pos < end:
+            row, pos = self._read_row(data, pos, table_map, present, names,
+                                      char_set)
+            if action == 'UPDATE':
+                after, pos = self._read_row(data, pos, table_map,
+                                            present_after, names, char_set)
+                self._execute(table, action, row, after)
+            else:
+                self._execute(table, action, row)
+        return flags & _stmt_end_flag
+
+    def _read_row(self, data, pos, table_map, present, names, char_set):
+        columns = [i for i, is_present in enumerate(present) if is_present]
+        nulls = _bitmap_bits(data, pos, len(columns))
+        pos += (len(columns) + 7) // 8
+        row = {}
+        for i, is_null in zip(columns, nulls):
+            if is_null:
+                value = None
+            else:
+                value, pos = self._read_value(data, pos,
+                                              table_map.types[i],
+                                              table_map.meta[i],
+                                              table_map.unsigned[i])
+                if char_set and isinstance(value, str):
+                    value = value.decode(char_set)
+            row[names[i]] = value
+        return row, pos
+
+    def _read_value(self, data, pos, col_type, meta, unsigned):
+        if col_type in _int_formats:
+            signed_fmt, unsigned_fmt, size = _int_formats[col_type]
+            fmt = unsigned_fmt if unsigned else signed_fmt
+            return struct.unpack_from(fmt, data, pos)[0], pos + size
+        elif col_type == TYPE_INT24:
+            value = _read_uint_le(data, pos, 3)
+            if not unsigned and value & 0x800000:
+                value -= 0x1000000
+            return value, pos + 3
+        elif col_type == TYPE_FLOAT:
+            return struct.unpack_from('<f', data, pos)[0], pos + 4
+        elif col_type == TYPE_DOUBLE:
+            return struct.unpack_from('<d', data, pos)[0], pos + 8
+        elif col_type == TYPE_NEWDECIMAL:
+            return _read_decimal(data, pos, meta >> 8, meta & 0xff)
+        elif col_type in (TYPE_VARCHAR, TYPE_VAR_STRING):
+            return self._read_string(data, pos, 1 if meta < 256 else 2)
+        elif col_type == TYPE_STRING:
+            real_type, length = _parse_string_meta(meta)
+            if real_type == TYPE_ENUM:
+                return _read_uint_le(data, pos, length), pos + length
+            elif real_type == TYPE_SET:
+                return data[pos:pos + length], pos + length
+            return self._read_string(data, pos, 1 if length < 256 else 2)
+        elif col_type in (TYPE_BLOB, TYPE_GEOMETRY, TYPE_JSON):
+            return self._read_string(data, pos, meta)
+        elif col_type == TYPE_YEAR:
+            year = ord(data[pos])
+            return (year + 1900 if year else 0), pos + 1
+        elif col_type in (TYPE_DATE, TYPE_NEWDATE):
+            value = _read_uint_le(data, pos, 3)
+            return _datetime_or_none(value >> 9, (value >> 5) & 15,
+                                     value & 31), pos + 3
+        elif col_type == TYPE_TIME:
+            value = _read_uint_le(data, pos, 3)
+            return _time_struct(value // 10000, (value // 100) % 100,
+                                value % 100), pos + 3
+        elif col_type == TYPE_TIME2:
+            value = _read_uint_be(data, pos, 3) - 0x800000
+            _, pos = _read_frac(data, pos + 3, meta)
+            if value < 0:
+                return None, pos
+            return _time_struct((value >> 12) & 0x3ff, (value >> 6) & 0x3f,
+                                value & 0x3f), pos
+        elif col_type == TYPE_DATETIME:
+            value = struct.unpack_from('<Q', data, pos)[0]
+            date, clock = divmod(value, 1000000)
+            return _datetime_or_none(date // 10000, (date // 100) % 100,
+                                     date % 100, clock // 10000,
+                                     (clock // 100) % 100,
+                                     clock % 100), pos + 8
+        elif col_type == TYPE_DATETIME2:
+            value = _read_uint_be(data, pos, 5) - 0x8000000000
+            usec, pos = _read_frac(data, pos + 5, meta)
+            ymd, hms = value >> 17, value % (1 << 17)
+            return _datetime_or_none((ymd >> 5) // 13, (ymd >> 5) % 13,
+                                     ymd % (1 << 5), hms >> 12,
+                                     (hms >> 6) % (1 << 6), hms % (1 << 6),
+                                     usec), pos
+        elif col_type == TYPE_TIMESTAMP:
+            return float(struct.unpack_from('<I', data, pos)[0]), pos + 4
+        elif col_type == TYPE_TIMESTAMP2:
+            seconds = _read_uint_be(data, pos, 4)
+            usec, pos = _read_frac(data, pos + 4, meta)
+            return seconds + usec / 1000000.0, pos
+        elif col_type == TYPE_BIT:
+            num_bits = (meta & 0xff) * 8 + (meta >> 8)
+            size = (num_bits + 7) // 8
+            bits = bitstring.Bits(bytes=data[pos:pos + size])
+            return bits[size * 8 - num_bits:].tobytes(), pos + size
+        raise BinlogFormatError('Unsupported column type: {0}'.format(
+            col_type))
+
+    def _read_string(self, data, pos, length_size):
+        length = _read_uint_le(data, pos, length_size)
+        pos += length_size
+        return data[pos:pos + length], pos + length
+
+
+# vim:et:fdm=marker:sts=4:sw=4:ts=4
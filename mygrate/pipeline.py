@@ -0,0 +1,296 @@
+# Copyright (c) 2013 Ian C. Good
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+from __future__ import absolute_import
+
+import os
+import sys
+import errno
+import threading
+import Queue
+from time import time
+
+__all__ = ['QueueStats', 'BoundedQueue', 'Pipeline']
+
+
+def _call(func, *args):
+    func(*args)
+
+
+class QueueStats(object):
+    """Counters for a :class:`BoundedQueue`. Time spent blocked on a full
+    queue means the consuming stage is the bottleneck, and time spent blocked
+    on an empty queue means the producing stage is the bottleneck.
+
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.max_depth = 0
+        self.full_stalls = 0
+        self.full_time = 0.0
+        self.empty_stalls = 0
+        self.empty_time = 0.0
+
+    def as_dict(self):
+        return {'depth': self.depth,
+                'max_depth': self.max_depth,
+                'full_stalls': self.full_stalls,
+                'full_time': self.full_time,
+                'empty_stalls': self.empty_stalls,
+                'empty_time': self.empty_time}
+
+
+class BoundedQueue(Queue.Queue):
+    """A :class:`Queue.Queue` with a size limit, which blocks the producing
+    stage when the consuming stage falls behind, and which keeps
+    :class:`QueueStats` counters about the time each side spends blocked.
+
+    Blocking calls wake up periodically to check if they should give up, so
+    that a stopped pipeline never leaves a thread blocked forever.
+
+    :param maxsize: The number of items the queue may hold.
+    :param stats: The :class:`QueueStats` to update.
+
+    """
+
+    def __init__(self, maxsize, stats=None):
+        Queue.Queue.__init__(self, maxsize)
+        self.stats = stats or QueueStats()
+
+    def put_until(self, item, stop=None, interval=0.5):
+        """Adds an item to the queue, blocking while it is full.
+
+        :param item: The item to add.
+        :param stop: If this function returns True while blocked, give up.
+        :param interval: How often ``stop`` is checked, in seconds.
+        :returns: True if the item was added.
+
+        """
+        stats = self.stats
+        try:
+            self.put(item, False)
+        except Queue.Full:
+            start = time()
+            stats.full_stalls += 1
+            try:
+                while True:
+                    try:
+                        self.put(item, True, interval)
+                        break
+                    except Queue.Full:
+                        if stop and stop():
+                            return False
+            finally:
+                stats.full_time += time() - start
+        depth = self.qsize()
+        stats.depth = depth
+        if depth > stats.max_depth:
+            stats.max_depth = depth
+        return True
+
+    def get_until(self, stop=None, interval=0.5):
+        """Removes an item from the queue, blocking while it is empty.
+
+        :param stop: If this function returns True while blocked, give up.
+        :param interval: How often ``stop`` is checked, in seconds.
+        :returns: The item, or None if the wait was given up.
+
+        """
+        stats = self.stats
+        try:
+            item = self.get(False)
+        except Queue.Empty:
+            start = time()
+            stats.empty_stalls += 1
+            try:
+                while True:
+                    try:
+                        item = self.get(True, interval)
+                        break
+                    except Queue.Empty:
+                        if stop and stop():
+                            return None
+            finally:
+                stats.empty_time += time() - start
+        stats.depth = self.qsize()
+        return item
+
+
+class Pipeline(object):
+    """Splits the processing of a binlog into three stages, each on its own
+    thread, joined by :class:`BoundedQueue` objects:
+
+    * The reader stage reads output from ``mysqlbinlog`` in large chunks.
+    * The parser stage, run by the caller, splits the chunks into lines and
+      parses them.
+    * The dispatch stage runs the callbacks and checkpoints produced by the
+      parser, in order.
+
+    The pipeline is used in place of the
+    :class:`~mygrate.callbacks.MygrateCallbacks` object given to the parser.
+    If a callback raises an exception, the exception is raised again from the
+    next call made on the pipeline, and no later checkpoints are run.
+
+    :param callbacks: The callbacks to execute in the dispatch stage.
+    :param checkpoint: The function to run checkpoints with in the dispatch
+                       stage, called with the checkpoint function and its
+                       arguments.
+    :param queue_size: The number of chunks that may wait on the parser stage.
+    :param dispatch_size: The number of changes that may wait on the dispatch
+                          stage.
+    :param chunk_size: The largest chunk read in the reader stage, in bytes.
+
+    """
+
+    def __init__(self, callbacks, checkpoint=None, queue_size=64,
+                 dispatch_size=4096, chunk_size=65536):
+        self.callbacks = callbacks
+        self._checkpoint = checkpoint or _call
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.reader_stats = QueueStats()
+        self.dispatch = BoundedQueue(dispatch_size)
+        self.error = None
+        self.thread = threading.Thread(target=self._dispatch)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __getattr__(self, name):
+        return getattr(self.callbacks, name)
+
+    def get_stats(self):
+        """Gets the counters for the queues between the stages.
+
+        :returns: Dict of queue names to dicts of counters.
+
+        """
+        return {'reader': self.reader_stats.as_dict(),
+                'dispatch': self.dispatch.stats.as_dict()}
+
+    def _read(self, fd, chunks, stop):
+        try:
+            while True:
+                try:
+                    chunk = os.read(fd, self.chunk_size)
+                except OSError as exc:
+                    if exc.errno == errno.EINTR:
+                        continue
+                    raise
+                if not chunks.put_until(chunk, stop.is_set) or not chunk:
+                    break
+        except Exception:
+            chunks.put_until(sys.exc_info(), stop.is_set)
+
+    def read_lines(self, stream, is_done=None):
+        """Generates lines from a stream, which is read in the reader stage.
+
+        :param stream: The file object to read, such as the ``stdout`` of a
+                       ``mysqlbinlog`` process.
+        :param is_done: If this function returns True while waiting for the
+                        stream, stop generating lines.
+
+        """
+        chunks = BoundedQueue(self.queue_size, self.reader_stats)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._read,
+                                  args=(stream.fileno(), chunks, stop))
+        thread.daemon = True
+        thread.start()
+        partial = ''
+        try:
+            while True:
+                chunk = chunks.get_until(is_done)
+                if chunk is None:
+                    return
+                elif isinstance(chunk, tuple):
+                    raise chunk[0], chunk[1], chunk[2]
+                elif not chunk:
+                    break
+                lines = (partial + chunk).split('\n')
+                partial = lines.pop()
+                for line in lines:
+                    yield line + '\n'
+            if partial:
+                yield partial
+        finally:
+            stop.set()
+
+    def _dispatch(self):
+        while True:
+            item = self.dispatch.get_until()
+            try:
+                if item is None:
+                    return
+                if self.error is not None:
+                    continue
+                func, args = item
+                try:
+                    func(*args)
+                except Exception:
+                    self.error = sys.exc_info()
+            finally:
+                self.dispatch.task_done()
+
+    def _put(self, func, *args):
+        self._check_error()
+        self.dispatch.put_until((func, args))
+
+    def _check_error(self):
+        if self.error is not None:
+            self.dispatch.join()
+            error, self.error = self.error, None
+            raise error[0], error[1], error[2]
+
+    def execute(self, table, action, *args):
+        self._put(self.callbacks.execute, table, action, *args)
+
+    def execute_transaction(self, changes):
+        self._put(self.callbacks.execute_transaction, changes)
+
+    def checkpoint(self, func, *args):
+        """Runs ``func`` with ``args`` in the dispatch stage, once the changes
+        before it have been dispatched.
+
+        :param func: The function to call, usually to store a binlog position.
+
+        """
+        self._put(self._checkpoint, func, *args)
+
+    def wait(self):
+        """Waits for the dispatch stage to run every change and checkpoint.
+
+        """
+        self.dispatch.join()
+        self._check_error()
+
+    def close(self):
+        """Waits for the dispatch stage to finish, and then stops it.
+
+        """
+        try:
+            self.wait()
+        finally:
+            self.dispatch.put_until(None)
+            self.thread.join()
+
+
+# vim:et:fdm=marker:sts=4:sw=4:ts=4
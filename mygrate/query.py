@@ -27,6 +27,8 @@ import optparse
 import MySQLdb
 import MySQLdb.cursors
 
+from .coroutines import CoroutineRunner
+
 
 class InitialQuery(object):
     """Manages direct queries to MySQL for importing, validation, and
@@ -35,21 +37,44 @@ class InitialQuery(object):
     """
 
     def __init__(self, mysql_info, callbacks, action='INSERT',
-                 streaming=False):
+                 streaming=False, concurrency=0):
         self.mysql_info = mysql_info
         self.callbacks = callbacks
         self.action = action
         self.streaming = streaming
+        self.runner = None
+        if concurrency:
+            self.runner = CoroutineRunner(concurrency)
         self.log = logging.getLogger('mygrate.query')
 
     def run_callback(self, table, cols):
-        """Executes the INSERT callback for the given table.
+        """Executes the INSERT callback for the given table. If the query was
+        created with a ``concurrency`` limit, the callback is run on an event
+        loop and may be a coroutine function, and this method only waits for a
+        free slot before returning.
 
         :param table: The table being imported from.
         :param cols: The column dict containing the row data.
 
         """
-        self.callbacks.execute(table, self.action, cols)
+        if self.runner:
+            callback = self.callbacks.get_callback(table, self.action)
+            if callback is None:
+                return
+
+            def on_error():
+                self.callbacks.error_handler(table, self.action, (cols, ), {})
+            self.runner.submit((), on_error, callback, table, cols)
+        else:
+            self.callbacks.execute(table, self.action, cols)
+
+    def close(self):
+        """Waits for callbacks still in flight, and then stops the event loop
+        they run on.
+
+        """
+        if self.runner:
+            self.runner.close()
 
     def get_connection(self, db):
         """Creates and returns a connection to the MySQL server and selects the
@@ -89,6 +114,8 @@ class InitialQuery(object):
             cur.execute(sql)
             for row in cur:
                 self.run_callback(full_table, row)
+            if self.runner:
+                self.runner.wait()
         except Exception:
             self.log.exception('Unhandled exception')
         finally:
@@ -112,6 +139,9 @@ registered callbacks are queried.
     op = optparse.OptionParser(usage=usage, description=description)
     op.add_option('-s', '--stream', action='store_true', default=False,
                   help='Stream the query results from the MySQL server.')
+    op.add_option('-c', '--concurrency', type='int', default=0, metavar='NUM',
+                  help='Run callbacks on an event loop, with up to NUM in '
+                  'flight at once. Callbacks may be coroutine functions.')
     options, requested_tables = op.parse_args()
 
     from .config import cfg
@@ -125,9 +155,13 @@ registered callbacks are queried.
         requested_tables = callbacks.get_registered_tables()
 
     query = InitialQuery(mysql_info, callbacks,
-                         streaming=options.stream)
-    for table in requested_tables:
-        query.process_table(table)
+                         streaming=options.stream,
+                         concurrency=options.concurrency)
+    try:
+        for table in requested_tables:
+            query.process_table(table)
+    finally:
+        query.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,204 @@
+# Copyright (c) 2013 Ian C. Good
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+from __future__ import absolute_import
+
+import os
+import os.path
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from time import sleep
+
+__all__ = ['PollingWatcher', 'InotifyWatcher', 'get_watcher']
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVE_SELF = 0x00000800
+IN_DELETE_SELF = 0x00000400
+
+_watch_mask = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVE_SELF |
+               IN_DELETE_SELF)
+_event_header = struct.Struct('iIII')
+
+
+class PollingWatcher(object):
+    """Waits for changes to a set of files by periodically checking their
+    modification times. The delay between checks starts at ``min_delay`` and
+    doubles every time no change is found, up to ``max_delay``. As soon as a
+    change is found, the delay is reset to ``min_delay``.
+
+    :param min_delay: The shortest delay between checks, in seconds.
+    :param max_delay: The longest delay between checks, in seconds.
+
+    """
+
+    def __init__(self, min_delay=0.01, max_delay=1.0):
+        self.min_delay = min(min_delay, max_delay)
+        self.max_delay = max_delay
+        self.delay = self.min_delay
+        self.mtimes = {}
+
+    def _get_mtime(self, path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def watch(self, paths):
+        """Sets the files to watch for changes. Files that were already being
+        watched keep their last known state.
+
+        :param paths: List of file paths.
+
+        """
+        mtimes = {}
+        for path in paths:
+            if path in self.mtimes:
+                mtimes[path] = self.mtimes[path]
+            else:
+                mtimes[path] = self._get_mtime(path)
+        self.mtimes = mtimes
+
+    def wait(self):
+        """Sleeps for the current delay and checks the watched files.
+
+        :returns: True if a watched file changed, False otherwise.
+
+        """
+        sleep(self.delay)
+        changed = False
+        for path, old_mtime in self.mtimes.items():
+            mtime = self._get_mtime(path)
+            if mtime != old_mtime:
+                self.mtimes[path] = mtime
+                changed = True
+        if changed:
+            self.delay = self.min_delay
+        else:
+            self.delay = min(self.delay * 2, self.max_delay)
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """Waits for changes to a set of files using the Linux inotify API, so
+    that waiting costs nothing while the files are idle and returns as soon as
+    a file is modified.
+
+    :param retry_delay: While a file could not be watched, e.g. because it
+                        does not exist yet, waiting times out after this many
+                        seconds so the file can be checked again.
+    :raises OSError: The inotify API is not available.
+
+    """
+
+    def __init__(self, retry_delay=1.0):
+        self.retry_delay = retry_delay
+        self.paths = []
+        self.watches = {}
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError(errno.ENOSYS, 'libc not found')
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        try:
+            init = self.libc.inotify_init
+        except AttributeError:
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self.fd = init()
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def watch(self, paths):
+        """Sets the files to watch for changes.
+
+        :param paths: List of file paths.
+
+        """
+        self.paths = list(paths)
+        for path in list(self.watches):
+            if path not in paths:
+                self.libc.inotify_rm_watch(self.fd, self.watches.pop(path))
+        for path in paths:
+            if path in self.watches:
+                continue
+            wd = self.libc.inotify_add_watch(self.fd, path, _watch_mask)
+            if wd >= 0:
+                self.watches[path] = wd
+
+    def _drain(self):
+        data = os.read(self.fd, 65536)
+        pos = 0
+        while pos + _event_header.size <= len(data):
+            wd, mask, cookie, name_len = _event_header.unpack_from(data, pos)
+            pos += _event_header.size + name_len
+            if mask & (IN_MOVE_SELF | IN_DELETE_SELF):
+                for path, path_wd in list(self.watches.items()):
+                    if path_wd == wd:
+                        self.libc.inotify_rm_watch(self.fd, wd)
+                        del self.watches[path]
+
+    def wait(self):
+        """Blocks until a watched file changes, the timeout expires, or a
+        signal is received.
+
+        :returns: True if a watched file changed, False otherwise.
+
+        """
+        timeout = None
+        if len(self.watches) < len(self.paths):
+            timeout = self.retry_delay
+        try:
+            readable, _, _ = select.select([self.fd], [], [], timeout)
+        except select.error as exc:
+            if exc.args[0] == errno.EINTR:
+                return False
+            raise
+        if readable:
+            self._drain()
+            return True
+        return False
+
+    def close(self):
+        os.close(self.fd)
+
+
+def get_watcher(min_delay=0.01, max_delay=1.0):
+    """Builds the best available watcher for the system, using inotify if
+    possible and falling back to :class:`PollingWatcher`.
+
+    :param min_delay: The shortest delay between polling checks.
+    :param max_delay: The longest delay between polling checks.
+
+    """
+    try:
+        return InotifyWatcher(max_delay)
+    except OSError:
+        return PollingWatcher(min_delay, max_delay)
+
+
+# vim:et:fdm=marker:sts=4:sw=4:ts=4
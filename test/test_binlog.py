@@ -7,11 +7,48 @@ import tempfile
 import shutil
 import subprocess
 from datetime import datetime
+from StringIO import StringIO
 
-from mox import MoxTestBase
+from mox import MoxTestBase, IgnoreArg
 
-from mygrate.binlog import (InsertQuery, UpdateQuery, DeleteQuery,
-                            QueryParser, BinlogParser)
+import MySQLdb
+
+import mygrate.binlog
+from mygrate.binlog import (ValueParser, InsertQuery, UpdateQuery,
+                            DeleteQuery, QueryParser, BinlogParser)
+
+
+class TestValueParser(MoxTestBase):
+
+    def test_get_decoder(self):
+        decode = ValueParser.get_decoder('int', 'int(11)')
+        self.assertEqual(-5, decode('-5 (4294967291)'))
+        self.assertEqual(9, decode('9'))
+        self.assertEqual(None, decode('NULL'))
+        decode = ValueParser.get_decoder('INT', 'int(10) unsigned')
+        self.assertEqual(4294967291, decode('-5 (4294967291)'))
+        self.assertEqual(9, decode('9'))
+        decode = ValueParser.get_decoder('varchar', 'varchar(64)')
+        self.assertEqual('as\'df', decode("'as'df'"))
+        self.assertEqual('NULL', decode("'NULL'"))
+        self.assertEqual(None, decode('NULL'))
+        decode = ValueParser.get_decoder('double', 'double')
+        self.assertEqual(1.5, decode('1.5'))
+        decode = ValueParser.get_decoder('datetime', 'datetime')
+        self.assertEqual(datetime(2013, 1, 1, 13, 30),
+                         decode('2013-01-01 13:30:00'))
+        self.assertEqual(datetime(2013, 1, 1, 13, 30, 0, 120000),
+                         decode('2013-01-01 13:30:00.12'))
+        self.assertEqual(None, decode('0000-00-00 00:00:00'))
+        decode = ValueParser.get_decoder('date', 'date')
+        self.assertEqual(datetime(2013, 1, 1), decode('2013-01-01'))
+        decode = ValueParser.get_decoder('bit', 'bit(32)')
+        self.assertEqual('test', decode("b'01110100011001010111001101110100'"))
+
+    def test_get_decoder_unknown(self):
+        decode = ValueParser.get_decoder('geometry', 'geometry')
+        self.assertEqual(9, decode('9'))
+        self.assertEqual('asdf', decode("'asdf'"))
 
 
 class TestQueryParsing(MoxTestBase):
@@ -58,6 +95,17 @@ class TestQueryParsing(MoxTestBase):
         self.assertEqual(['asdf', 9], q.values['SET'])
         self.assertEqual(['jkl', 10], q.values['WHERE'])
 
+    def test_querybase_parse_decoders(self):
+        decoders = {'testdb.testtable': [ValueParser.get_decoder('int', 'int'),
+                                         ValueParser.get_decoder('char', '')]}
+        q = InsertQuery('INSERT INTO `testdb`.`testtable`', None, None, {},
+                        decoders)
+        q.parse("SET")
+        q.parse("  @1=-1 (255)")
+        q.parse("  @2='1234'")
+        q.parse("  @3=13")
+        self.assertEqual([-1, '1234', 13], q.values['SET'])
+
     def test_insertquery_finish(self):
         callbacks = self.mox.CreateMockAnything()
         callbacks.execute('testdb.testtable', 'INSERT',
@@ -133,6 +181,43 @@ class TestQueryParsing(MoxTestBase):
         qp.finish()
         self.assertEqual(None, qp.current)
 
+    def test_queryparser_transaction(self):
+        callbacks = self.mox.CreateMockAnything()
+        callbacks.get_registered_tables(). \
+            MultipleTimes().AndReturn(['testdb.testtable'])
+        callbacks.execute_transaction(
+            [('testdb.testtable', 'INSERT', ({'one': 'asdf', 'two': None}, )),
+             ('testdb.testtable', 'DELETE', ({'one': 'jkl', 'two': None}, ))])
+        self.mox.ReplayAll()
+        qp = QueryParser(callbacks, {'testdb.testtable': ['one', 'two']}, {})
+        self.assertFalse(qp.parse_statement('BEGIN'))
+        self.assertTrue(qp.in_transaction)
+        qp.parse("INSERT INTO `testdb`.`testtable`")
+        qp.parse("SET")
+        qp.parse("  @1='asdf'")
+        qp.parse("  @2=NULL")
+        qp.parse("DELETE FROM `testdb`.`testtable`")
+        qp.parse("WHERE")
+        qp.parse("  @1='jkl'")
+        qp.parse("  @2=NULL")
+        self.assertTrue(qp.parse_statement('COMMIT/*!*/;'))
+        self.assertFalse(qp.in_transaction)
+        self.assertFalse(qp.parse_statement('ROLLBACK /* added */;'))
+
+    def test_queryparser_incomplete_transaction(self):
+        callbacks = self.mox.CreateMockAnything()
+        callbacks.get_registered_tables(). \
+            MultipleTimes().AndReturn(['testdb.testtable'])
+        self.mox.ReplayAll()
+        qp = QueryParser(callbacks, {'testdb.testtable': ['one', 'two']}, {})
+        qp.parse_statement('BEGIN')
+        qp.parse("INSERT INTO `testdb`.`testtable`")
+        qp.parse("SET")
+        qp.parse("  @1='asdf'")
+        qp.parse("  @2=NULL")
+        qp.finish()
+        self.assertFalse(qp.in_transaction)
+
 
 class TestBinlogParser(MoxTestBase):
 
@@ -144,6 +229,31 @@ class TestBinlogParser(MoxTestBase):
         super(TestBinlogParser, self).tearDown()
         shutil.rmtree(self.tmp_dir)
 
+    def test_load_column_names(self):
+        callbacks = self.mox.CreateMockAnything()
+        conn = self.mox.CreateMockAnything()
+        cur = self.mox.CreateMockAnything()
+        self.mox.StubOutWithMock(MySQLdb, 'connect')
+        MySQLdb.connect(host='testhost').AndReturn(conn)
+        callbacks.get_registered_tables().AndReturn(['testdb.testtable'])
+        conn.cursor().AndReturn(cur)
+        cur.execute(IgnoreArg(), ('testdb', 'testtable'))
+        cur.fetchall().AndReturn([('one', 'int', 'int(10) unsigned', 'PRI'),
+                                  ('two', 'varchar', 'varchar(32)', '')])
+        cur.close()
+        conn.close()
+        self.mox.ReplayAll()
+        blp = BinlogParser(None, None, callbacks)
+        blp.load_column_names({'host': 'testhost'})
+        self.assertEqual(['one', 'two'], blp.column_names['testdb.testtable'])
+        self.assertEqual([('int', 'int(10) unsigned'),
+                          ('varchar', 'varchar(32)')],
+                         blp.column_types['testdb.testtable'])
+        self.assertEqual(['one'], blp.primary_keys['testdb.testtable'])
+        decoders = blp.column_decoders['testdb.testtable']
+        self.assertEqual(255, decoders[0]('-1 (255)'))
+        self.assertEqual('abc', decoders[1]("'abc'"))
+
     def test_read_position(self):
         blp = BinlogParser(None, None, None, None)
         self.assertEqual('0', blp.read_position('file does not exist'))
@@ -153,14 +263,20 @@ class TestBinlogParser(MoxTestBase):
             os.fsync(f.fileno())
             self.assertEqual('1234', blp.read_position(f.name))
 
+    def test_get_position(self):
+        with open(os.path.join(self.tmp_dir, 'binlogpos.000001'), 'w') as f:
+            f.write('1234')
+        blp = BinlogParser(None, self.tmp_dir, None, None)
+        self.assertEqual('1234', blp.get_position('/path/to/binlog.000001'))
+        self.assertEqual('0', blp.get_position('/path/to/binlog.000002'))
+
     def test_write_position(self):
-        blp = BinlogParser(None, None, None, None)
-        with tempfile.NamedTemporaryFile() as f:
-            self.assertEqual('0', blp.read_position(f.name))
-            blp.write_position(f, '4321')
-            self.assertEqual('4321', blp.read_position(f.name))
-            blp.write_position(f, '1337')
-            self.assertEqual('1337', blp.read_position(f.name))
+        blp = BinlogParser(None, self.tmp_dir, None, None)
+        blp.write_position('/path/to/binlog.000001', '4321')
+        self.assertEqual('4321', blp.get_position('/path/to/binlog.000001'))
+        blp.write_position('/path/to/binlog.000001', '1337')
+        blp = BinlogParser(None, self.tmp_dir, None, None)
+        self.assertEqual('1337', blp.get_position('/path/to/binlog.000001'))
 
     def test_read_index(self):
         with tempfile.NamedTemporaryFile() as f:
@@ -208,7 +324,8 @@ class TestBinlogParser(MoxTestBase):
         blp = BinlogParser(None, self.tmp_dir, callbacks,
                            {'testdb.testtable': ['one', 'two']})
         blp.process_binlog('/path/to/binlog.000001')
-        self.assertEqual('4321', blp.read_position(pos_file))
+        blp = BinlogParser(None, self.tmp_dir, None)
+        self.assertEqual('4321', blp.get_position('/path/to/binlog.000001'))
 
     def test_process_all_binlogs(self):
         blp = BinlogParser(None, None, None, None)
@@ -223,14 +340,82 @@ class TestBinlogParser(MoxTestBase):
         self.mox.ReplayAll()
         blp.process_all_binlogs()
 
+    def test_follow_binlogs(self):
+        index_file = os.path.join(self.tmp_dir, 'binlog.index')
+        binlog1 = os.path.join(self.tmp_dir, 'binlog.000001')
+        binlog2 = os.path.join(self.tmp_dir, 'binlog.000002')
+        with open(index_file, 'w') as f:
+            f.write('./binlog.000001\n./binlog.000002\n')
+        for binlog in (binlog1, binlog2):
+            with open(binlog, 'w') as f:
+                f.write('x'*256)
+        with open(os.path.join(self.tmp_dir, 'binlogpos.000001'), 'w') as f:
+            f.write('256')
+        self.mox.StubOutWithMock(subprocess, 'Popen')
+        proc = self.mox.CreateMockAnything()
+        proc.stdin = self.mox.CreateMockAnything()
+        proc.stdout = StringIO('#700101  0:00:00 server id 1  end_log_pos 0 '
+                               '\tRotate to binlog.000002  pos: 4\n'
+                               '### INSERT INTO `testdb`.`testtable`\n'
+                               '### SET\n'
+                               "###   @1='asdf'\n"
+                               '###   @2=NULL\n'
+                               '# at 120\n'
+                               '#700101  0:00:00 server id 1  end_log_pos 0 '
+                               '\tRotate to binlog.000003  pos: 4\n'
+                               '# at 4\n'
+                               '# at 150\n')
+        self.mox.StubOutWithMock(mygrate.binlog, 'find_executable')
+        mygrate.binlog.find_executable('stdbuf').AndReturn(None)
+        subprocess.Popen(['mysqlbinlog', '-v', '--base64-output=DECODE-ROWS',
+                          '--read-from-remote-server', '--stop-never',
+                          '-j', '0', '--set-charset=utf8',
+                          '--host=testhost', 'binlog.000002'],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                         env=IgnoreArg()).AndReturn(proc)
+        proc.stdin.close()
+        callbacks = self.mox.CreateMockAnything()
+        callbacks.get_registered_tables(). \
+            MultipleTimes().AndReturn(['testdb.testtable'])
+        callbacks.execute('testdb.testtable', 'INSERT',
+                          {'one': 'asdf', 'two': None})
+        proc.poll().AndReturn(0)
+        proc.wait()
+        self.mox.ReplayAll()
+        blp = BinlogParser(index_file, self.tmp_dir, callbacks,
+                           {'testdb.testtable': ['one', 'two']})
+        blp.follow_binlogs({'host': 'testhost'})
+        blp = BinlogParser(index_file, self.tmp_dir, None)
+        self.assertEqual('120', blp.get_position(binlog2))
+        self.assertEqual('150', blp.get_position('binlog.000003'))
+
+    def test_process_all_binlogs_rotated(self):
+        blp = BinlogParser(None, None, None, None)
+        self.mox.StubOutWithMock(blp, 'read_index')
+        self.mox.StubOutWithMock(blp, 'process_binlog')
+        self.mox.StubOutWithMock(os.path, 'getmtime')
+        blp.read_index().AndReturn(['/path/to/test.1', '/path/to/test.2'])
+        os.path.getmtime('/path/to/test.1').AndReturn(10.0)
+        blp.process_binlog('/path/to/test.1')
+        os.path.getmtime('/path/to/test.2').AndReturn(20.0)
+        blp.process_binlog('/path/to/test.2')
+        blp.read_index().AndReturn(['/path/to/test.1', '/path/to/test.2',
+                                    '/path/to/test.3'])
+        os.path.getmtime('/path/to/test.2').AndReturn(20.0)
+        os.path.getmtime('/path/to/test.3').AndReturn(30.0)
+        blp.process_binlog('/path/to/test.3')
+        self.mox.ReplayAll()
+        blp.process_all_binlogs()
+        blp.process_all_binlogs()
+
     def test_set_binlogpos_at_end(self):
         binlog_file = os.path.join(self.tmp_dir, 'binlog.001')
         blp = BinlogParser(None, self.tmp_dir, None, None)
         with open(binlog_file, 'w') as f:
             f.write('x'*256)
         blp.set_binlogpos_at_end(binlog_file)
-        self.assertEqual('256', blp.read_position(
-            os.path.join(self.tmp_dir, 'binlogpos.001')))
+        blp = BinlogParser(None, self.tmp_dir, None, None)
+        self.assertEqual('256', blp.get_position(binlog_file))
 
 
 # vim:et:fdm=marker:sts=4:sw=4:ts=4
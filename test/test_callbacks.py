@@ -0,0 +1,41 @@
+
+from mox import MoxTestBase
+
+from mygrate.callbacks import MygrateCallbacks
+
+
+class TestMygrateCallbacks(MoxTestBase):
+
+    def test_get_registered_tables(self):
+        callbacks = MygrateCallbacks()
+        callbacks.register('db.one', 'INSERT', None)
+        callbacks.register_transaction(['db.one', 'db.two'], None)
+        self.assertEqual(['db.one', 'db.two'],
+                         sorted(callbacks.get_registered_tables()))
+
+    def test_execute_transaction(self):
+        insert = self.mox.CreateMockAnything()
+        transaction = self.mox.CreateMockAnything()
+        insert('db.one', {'id': 1})
+        transaction([('db.one', 'INSERT', ({'id': 1}, ))])
+        self.mox.ReplayAll()
+        callbacks = MygrateCallbacks()
+        callbacks.register('db.one', 'INSERT', insert)
+        callbacks.register_transaction(['db.one'], transaction)
+        callbacks.execute_transaction([('db.one', 'INSERT', ({'id': 1}, )),
+                                       ('db.two', 'DELETE', ({'id': 2}, ))])
+
+    def test_execute_transaction_error(self):
+        transaction = self.mox.CreateMockAnything()
+        handler = self.mox.CreateMockAnything()
+        changes = [('db.one', 'INSERT', ({'id': 1}, ))]
+        transaction(changes).AndRaise(ValueError)
+        handler(None, 'TRANSACTION', (changes, ), {})
+        self.mox.ReplayAll()
+        callbacks = MygrateCallbacks()
+        callbacks.register_transaction(['db.one'], transaction)
+        callbacks.register_error_handler(handler)
+        callbacks.execute_transaction(changes)
+
+
+# vim:et:fdm=marker:sts=4:sw=4:ts=4
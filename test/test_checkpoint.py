@@ -0,0 +1,71 @@
+
+import os
+import os.path
+import shutil
+import tempfile
+
+from mox import MoxTestBase
+
+from mygrate.checkpoint import CheckpointStore, atomic_write
+
+
+class TestCheckpointStore(MoxTestBase):
+
+    def setUp(self):
+        super(TestCheckpointStore, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super(TestCheckpointStore, self).tearDown()
+        shutil.rmtree(self.tmp_dir)
+
+    def _read_store(self):
+        return CheckpointStore(self.tmp_dir).get('/path/to/binlog.000001')
+
+    def test_atomic_write(self):
+        path = os.path.join(self.tmp_dir, 'test')
+        atomic_write(path, 'one')
+        atomic_write(path, 'two', fsync=True)
+        with open(path, 'r') as f:
+            self.assertEqual('two', f.read())
+        self.assertEqual(['test'], os.listdir(self.tmp_dir))
+
+    def test_update_always(self):
+        store = CheckpointStore(self.tmp_dir)
+        store.update('/path/to/binlog.000001', '1234')
+        self.assertEqual('1234', self._read_store())
+
+    def test_update_events(self):
+        store = CheckpointStore(self.tmp_dir, flush_events=2)
+        store.update('/path/to/binlog.000001', '1234')
+        self.assertEqual(None, self._read_store())
+        store.update('/path/to/binlog.000001', '4321')
+        self.assertEqual('4321', self._read_store())
+
+    def test_update_interval(self):
+        store = CheckpointStore(self.tmp_dir, flush_interval=60.0)
+        store.update('/path/to/binlog.000001', '1234')
+        self.assertEqual(None, self._read_store())
+        store.last_flush -= 60.0
+        store.update('/path/to/binlog.000001', '4321')
+        self.assertEqual('4321', self._read_store())
+
+    def test_update_commit(self):
+        store = CheckpointStore(self.tmp_dir, flush_on_commit=True)
+        store.update('/path/to/binlog.000001', '1234')
+        self.assertEqual(None, self._read_store())
+        store.update('/path/to/binlog.000001', '4321', True)
+        self.assertEqual('4321', self._read_store())
+
+    def test_flush(self):
+        store = CheckpointStore(self.tmp_dir, flush_events=100)
+        store.update('/path/to/binlog.000001', '1234')
+        store.update('/path/to/binlog.000002', '4321')
+        store.flush()
+        store = CheckpointStore(self.tmp_dir)
+        self.assertEqual('1234', store.get('/path/to/binlog.000001'))
+        self.assertEqual('4321', store.get('binlog.000002'))
+        self.assertEqual(None, store.get('binlog.000003'))
+
+
+# vim:et:fdm=marker:sts=4:sw=4:ts=4
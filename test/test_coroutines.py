@@ -0,0 +1,84 @@
+
+import unittest
+
+from mox import MoxTestBase
+
+from mygrate.callbacks import MygrateCallbacks
+from mygrate.coroutines import asyncio, CoroutineRunner, CoroutineDispatcher
+
+From = getattr(asyncio, 'From', None)
+
+
+def _get_callbacks(executed, delays):
+    def insert(table, row):
+        @asyncio.coroutine
+        def run():
+            yield From(asyncio.sleep(delays.get(row['id'], 0.0)))
+            executed.append(row['id'])
+        return run()
+    callbacks = MygrateCallbacks()
+    callbacks.register('db.table', 'INSERT', insert)
+    callbacks.register('db.table', 'UPDATE',
+                       lambda table, old, new: executed.append(new['id']))
+    return callbacks
+
+
+@unittest.skipIf(From is None, 'trollius is not installed')
+class TestCoroutineRunner(MoxTestBase):
+
+    def test_submit(self):
+        executed = []
+        runner = CoroutineRunner(concurrency=2)
+        runner.submit(['one'], None, asyncio.sleep, 0.05)
+        runner.submit(['one'], None, executed.append, 'second')
+        runner.submit(['two'], None, executed.append, 'first')
+        runner.defer(executed.append, 'checkpoint')
+        runner.close()
+        self.assertEqual(['first', 'second', 'checkpoint'], executed)
+
+    def test_submit_error(self):
+        errors = []
+
+        def on_error():
+            try:
+                raise
+            except ValueError as exc:
+                errors.append(exc)
+        runner = CoroutineRunner()
+        runner.submit([], on_error, int, 'x')
+        runner.wait()
+        self.assertEqual(1, len(errors))
+        runner.submit([], lambda: 1 / 0, int, 'x')
+        self.assertRaises(ZeroDivisionError, runner.wait)
+        runner.close()
+
+
+@unittest.skipIf(From is None, 'trollius is not installed')
+class TestCoroutineDispatcher(MoxTestBase):
+
+    def test_execute(self):
+        executed = []
+        callbacks = _get_callbacks(executed, {1: 0.05, 2: 0.01})
+        dispatcher = CoroutineDispatcher(callbacks, {'db.table': ['id']})
+        dispatcher.execute('db.table', 'INSERT', {'id': 1})
+        dispatcher.execute('db.table', 'INSERT', {'id': 2})
+        dispatcher.execute('db.table', 'INSERT', {'id': 3})
+        dispatcher.execute('db.table', 'UPDATE', {'id': 1}, {'id': 1})
+        dispatcher.checkpoint(executed.append, 'pos')
+        dispatcher.close()
+        self.assertEqual([3, 2, 1, 1, 'pos'], executed)
+
+    def test_execute_transaction(self):
+        executed = []
+        callbacks = _get_callbacks(executed, {1: 0.05})
+        callbacks.register_transaction(['db.table'],
+                                       lambda changes: executed.append('txn'))
+        dispatcher = CoroutineDispatcher(callbacks, {'db.table': ['id']})
+        dispatcher.execute_transaction(
+            [('db.table', 'INSERT', ({'id': 1}, )),
+             ('db.table', 'INSERT', ({'id': 2}, ))])
+        dispatcher.close()
+        self.assertEqual([2, 1, 'txn'], executed)
+
+
+# vim:et:fdm=marker:sts=4:sw=4:ts=4
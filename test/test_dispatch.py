@@ -0,0 +1,77 @@
+
+import threading
+
+from mox import MoxTestBase
+
+from mygrate.callbacks import MygrateCallbacks
+from mygrate.dispatch import Watermark, Dispatcher
+
+
+class TestWatermark(MoxTestBase):
+
+    def test_defer(self):
+        called = []
+        watermark = Watermark()
+        watermark.defer(called.append, 'first')
+        self.assertEqual(['first'], called)
+        seq1 = watermark.issue()
+        seq2 = watermark.issue()
+        watermark.defer(called.append, 'second')
+        seq3 = watermark.issue()
+        watermark.defer(called.append, 'third')
+        watermark.complete(seq2)
+        self.assertEqual(['first'], called)
+        watermark.complete(seq1)
+        self.assertEqual(['first', 'second'], called)
+        watermark.complete(seq3)
+        self.assertEqual(['first', 'second', 'third'], called)
+
+
+class TestDispatcher(MoxTestBase):
+
+    def _get_callbacks(self, executed, event=None):
+        def insert(table, row):
+            if event and row['id'] == 1:
+                event.wait()
+            executed.append(row['id'])
+        callbacks = MygrateCallbacks()
+        callbacks.register('db.table', 'INSERT', insert)
+        return callbacks
+
+    def test_execute(self):
+        executed = []
+        checkpoints = []
+        event = threading.Event()
+        dispatcher = Dispatcher(self._get_callbacks(executed, event),
+                                {'db.table': ['id']}, workers=4)
+        for i in range(1, 20):
+            dispatcher.execute('db.table', 'INSERT', {'id': i})
+        dispatcher.checkpoint(checkpoints.append, 'pos')
+        self.assertEqual([], checkpoints)
+        event.set()
+        dispatcher.close()
+        self.assertEqual(['pos'], checkpoints)
+        self.assertEqual(range(1, 20), sorted(executed))
+
+    def test_execute_ordered(self):
+        executed = []
+        dispatcher = Dispatcher(self._get_callbacks(executed), workers=4)
+        self.assertEqual(['db.table'], dispatcher.get_registered_tables())
+        for i in range(1, 50):
+            dispatcher.execute('db.table', 'INSERT', {'id': i})
+        dispatcher.close()
+        self.assertEqual(range(1, 50), executed)
+
+    def test_execute_error(self):
+        checkpoints = []
+        callbacks = MygrateCallbacks()
+        callbacks.register('db.table', 'DELETE', lambda table, row: 1 / 0)
+        dispatcher = Dispatcher(callbacks, {'db.table': ['id']}, workers=2)
+        dispatcher.execute('db.table', 'DELETE', {'id': 1})
+        self.assertRaises(ZeroDivisionError, dispatcher.wait)
+        dispatcher.checkpoint(checkpoints.append, 'pos')
+        self.assertEqual(['pos'], checkpoints)
+        dispatcher.close()
+
+
+# vim:et:fdm=marker:sts=4:sw=4:ts=4
@@ -0,0 +1,173 @@
+
+import os
+import os.path
+import shutil
+import tempfile
+import subprocess
+from datetime import datetime
+
+from mox import MoxTestBase, IgnoreArg
+
+from mygrate.callbacks import MygrateCallbacks
+from mygrate.binlog import BinlogParser
+from mygrate.events import BinlogEventReader, BinlogFormatError
+
+fixtures_dir = os.path.join(os.path.dirname(__file__), 'fixtures')
+binlog_fixture = os.path.join(fixtures_dir, 'binlog.000001')
+
+column_names = {'testdb.testtable': ['id', 'name', 'score', 'created',
+                                     'flags', 'amount', 'birthday', 'big',
+                                     'note']}
+column_types = {'testdb.testtable': [('int', 'int(10) unsigned'),
+                                     ('varchar', 'varchar(32)'),
+                                     ('double', 'double'),
+                                     ('datetime', 'datetime'),
+                                     ('bit', 'bit(8)'),
+                                     ('decimal', 'decimal(10,2)'),
+                                     ('date', 'date'),
+                                     ('bigint', 'bigint(20)'),
+                                     ('text', 'text')]}
+char_sets = {'testdb.testtable': 'utf8'}
+
+
+class TestBinlogEventReader(MoxTestBase):
+
+    def setUp(self):
+        super(TestBinlogEventReader, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super(TestBinlogEventReader, self).tearDown()
+        shutil.rmtree(self.tmp_dir)
+
+    def _get_callbacks(self, executed):
+        def record(action):
+            def callback(table, *args):
+                executed.append((table, action) + args)
+            return callback
+        callbacks = MygrateCallbacks()
+        for action in ('INSERT', 'UPDATE', 'DELETE'):
+            callbacks.register('testdb.testtable', action, record(action))
+        return callbacks
+
+    def _run_text(self, pipeline=False):
+        executed = []
+        self.mox.StubOutWithMock(subprocess, 'Popen')
+        proc = self.mox.CreateMockAnything()
+        proc.stdin = self.mox.CreateMockAnything()
+        proc.stdout = open(binlog_fixture + '.txt', 'r')
+        subprocess.Popen(IgnoreArg(), stdin=subprocess.PIPE,
+                         stdout=subprocess.PIPE).AndReturn(proc)
+        proc.stdin.close()
+        proc.wait()
+        self.mox.ReplayAll()
+        pos_dir = os.path.join(self.tmp_dir, 'text{0}'.format(int(pipeline)))
+        os.mkdir(pos_dir)
+        blp = BinlogParser(None, pos_dir, self._get_callbacks(executed),
+                           column_names, char_sets, column_types,
+                           pipeline=pipeline)
+        try:
+            blp.process_binlog(binlog_fixture)
+        finally:
+            proc.stdout.close()
+        blp.close()
+        self.assertEqual(str(os.path.getsize(binlog_fixture)),
+                         blp.get_position(binlog_fixture))
+        return executed
+
+    def _run_native(self, workers=0):
+        executed = []
+        pos_dir = os.path.join(self.tmp_dir, 'native{0}'.format(workers))
+        os.mkdir(pos_dir)
+        blp = BinlogParser(None, pos_dir, self._get_callbacks(executed),
+                           column_names, char_sets, column_types, native=True,
+                           workers=workers)
+        blp.process_binlog(binlog_fixture)
+        blp.close()
+        self.assertEqual(str(os.path.getsize(binlog_fixture)),
+                         blp.get_position(binlog_fixture))
+        return executed
+
+    def test_read(self):
+        executed = []
+        reader = BinlogEventReader(self._get_callbacks(executed),
+                                   column_names, char_sets, column_types)
+        positions = list(reader.read(binlog_fixture))
+        self.assertEqual((os.path.getsize(binlog_fixture), True),
+                         positions[-1])
+        self.assertEqual(['INSERT', 'INSERT', 'UPDATE', 'DELETE'],
+                         [call[1] for call in executed])
+        row1 = {'id': 1, 'name': u'asdf', 'score': 1.5,
+                'created': datetime(2013, 1, 1, 13, 30), 'flags': u'\x05',
+                'amount': 12.34, 'birthday': datetime(2013, 1, 1),
+                'big': -5, 'note': None}
+        row2 = {'id': 4000000000, 'name': u'caf\xe9', 'score': -0.25,
+                'created': datetime(2014, 2, 3, 4, 5, 6), 'flags': u'A',
+                'amount': -7.05, 'birthday': datetime(1999, 12, 31),
+                'big': 1234567890123, 'note': u'hello'}
+        self.assertEqual(('testdb.testtable', 'INSERT', row1), executed[0])
+        self.assertEqual(('testdb.testtable', 'INSERT', row2), executed[1])
+        self.assertEqual(('testdb.testtable', 'DELETE', row2), executed[3])
+
+    def test_read_from_position(self):
+        executed = []
+        reader = BinlogEventReader(self._get_callbacks(executed),
+                                   column_names, char_sets, column_types)
+        positions = list(reader.read(binlog_fixture))
+        executed = []
+        reader = BinlogEventReader(self._get_callbacks(executed),
+                                   column_names, char_sets, column_types)
+        list(reader.read(binlog_fixture, positions[-2][0]))
+        self.assertEqual(['DELETE'], [call[1] for call in executed])
+
+    def test_read_transactions(self):
+        transactions = []
+        callbacks = self._get_callbacks([])
+        callbacks.register_transaction(['testdb.testtable'],
+                                       transactions.append)
+        reader = BinlogEventReader(callbacks, column_names, char_sets,
+                                   column_types)
+        list(reader.read(binlog_fixture))
+        self.assertEqual([['INSERT', 'INSERT'], ['UPDATE'], ['DELETE']],
+                         [[change[1] for change in changes]
+                          for changes in transactions])
+
+    def test_read_incomplete_transaction(self):
+        executed = []
+        reader = BinlogEventReader(self._get_callbacks(executed),
+                                   column_names, char_sets, column_types)
+        positions = list(reader.read(binlog_fixture))
+        partial = os.path.join(self.tmp_dir, 'binlog.000001')
+        with open(binlog_fixture, 'rb') as f:
+            data = f.read()
+        with open(partial, 'wb') as f:
+            f.write(data[:positions[-1][0] - 1])
+        executed = []
+        reader = BinlogEventReader(self._get_callbacks(executed),
+                                   column_names, char_sets, column_types)
+        partial_positions = list(reader.read(partial))
+        self.assertEqual(positions[:-1], partial_positions)
+        self.assertEqual(['INSERT', 'INSERT', 'UPDATE'],
+                         [call[1] for call in executed])
+
+    def test_read_invalid(self):
+        invalid = os.path.join(self.tmp_dir, 'binlog.000002')
+        with open(invalid, 'w') as f:
+            f.write('x' * 64)
+        reader = BinlogEventReader(None, {}, {})
+        self.assertRaises(BinlogFormatError, list, reader.read(invalid))
+
+    def test_native_matches_text(self):
+        text_executed = self._run_text()
+        native_executed = self._run_native()
+        self.assertEqual(4, len(text_executed))
+        self.assertEqual(text_executed, native_executed)
+
+    def test_text_pipeline(self):
+        self.assertEqual(self._run_native(), self._run_text(pipeline=True))
+
+    def test_native_workers(self):
+        self.assertEqual(self._run_native(), self._run_native(workers=2))
+
+
+# vim:et:fdm=marker:sts=4:sw=4:ts=4
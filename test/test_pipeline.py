@@ -0,0 +1,77 @@
+
+import os
+import os.path
+import threading
+
+from mox import MoxTestBase
+
+from mygrate.callbacks import MygrateCallbacks
+from mygrate.pipeline import BoundedQueue, Pipeline
+
+binlog_text = os.path.join(os.path.dirname(__file__), 'fixtures',
+                           'binlog.000001.txt')
+
+
+class TestBoundedQueue(MoxTestBase):
+
+    def test_put_until(self):
+        queue = BoundedQueue(2)
+        self.assertTrue(queue.put_until('one'))
+        self.assertTrue(queue.put_until('two'))
+        self.assertFalse(queue.put_until('three', lambda: True, 0.01))
+        self.assertEqual(2, queue.stats.max_depth)
+        self.assertEqual(1, queue.stats.full_stalls)
+        self.assertTrue(queue.stats.full_time > 0.0)
+
+    def test_get_until(self):
+        queue = BoundedQueue(2)
+        queue.put_until('one')
+        self.assertEqual('one', queue.get_until())
+        self.assertEqual(None, queue.get_until(lambda: True, 0.01))
+        self.assertEqual(1, queue.stats.empty_stalls)
+        self.assertEqual(0, queue.stats.depth)
+
+
+class TestPipeline(MoxTestBase):
+
+    def test_read_lines(self):
+        pipeline = Pipeline(MygrateCallbacks(), queue_size=2, chunk_size=100)
+        with open(binlog_text, 'r') as f:
+            expected = f.readlines()
+        with open(binlog_text, 'r') as f:
+            self.assertEqual(expected, list(pipeline.read_lines(f)))
+        pipeline.close()
+        self.assertTrue(pipeline.get_stats()['reader']['max_depth'] >= 1)
+
+    def test_execute(self):
+        executed = []
+        event = threading.Event()
+
+        def insert(table, row):
+            event.wait()
+            executed.append(row['id'])
+        callbacks = MygrateCallbacks()
+        callbacks.register('db.table', 'INSERT', insert)
+        pipeline = Pipeline(callbacks)
+        self.assertEqual(['db.table'], pipeline.get_registered_tables())
+        pipeline.execute('db.table', 'INSERT', {'id': 1})
+        pipeline.execute_transaction([('db.table', 'INSERT', ({'id': 2}, ))])
+        pipeline.checkpoint(executed.append, 'pos')
+        self.assertEqual([], executed)
+        event.set()
+        pipeline.close()
+        self.assertEqual([1, 2, 'pos'], executed)
+
+    def test_execute_error(self):
+        executed = []
+        callbacks = MygrateCallbacks()
+        callbacks.register('db.table', 'DELETE', lambda table, row: 1 / 0)
+        pipeline = Pipeline(callbacks)
+        pipeline.execute('db.table', 'DELETE', {'id': 1})
+        pipeline.checkpoint(executed.append, 'pos')
+        self.assertRaises(ZeroDivisionError, pipeline.wait)
+        self.assertEqual([], executed)
+        pipeline.close()
+
+
+# vim:et:fdm=marker:sts=4:sw=4:ts=4
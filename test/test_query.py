@@ -4,6 +4,7 @@ import MySQLdb.cursors
 
 from mox import MoxTestBase, IgnoreArg
 
+from mygrate.callbacks import MygrateCallbacks
 from mygrate.query import InitialQuery
 
 
@@ -16,6 +17,17 @@ class TestInitialQuery(MoxTestBase):
         importer = InitialQuery(None, callbacks, 'TEST')
         importer.run_callback('test.test', {'one': 1, 'two': 2})
 
+    def test_run_callback_concurrency(self):
+        executed = []
+        callbacks = MygrateCallbacks()
+        callbacks.register('test.test', 'INSERT',
+                           lambda table, cols: executed.append(cols))
+        importer = InitialQuery(None, callbacks, concurrency=2)
+        importer.run_callback('test.test', {'one': 1})
+        importer.run_callback('test.other', {'one': 2})
+        importer.close()
+        self.assertEqual([{'one': 1}], executed)
+
     def test_get_connect(self):
         self.mox.StubOutWithMock(MySQLdb, 'connect')
         MySQLdb.connect(host='testhost', user='testuser', passwd='testpass',
@@ -0,0 +1,64 @@
+
+import os
+import os.path
+import shutil
+import tempfile
+
+from mox import MoxTestBase
+
+from mygrate import watch
+from mygrate.watch import PollingWatcher, InotifyWatcher, get_watcher
+
+
+class TestPollingWatcher(MoxTestBase):
+
+    def test_wait(self):
+        watcher = PollingWatcher(0.5, 2.0)
+        self.mox.StubOutWithMock(watch, 'sleep')
+        self.mox.StubOutWithMock(os.path, 'getmtime')
+        os.path.getmtime('/path/to/index').AndReturn(10.0)
+        watch.sleep(0.5)
+        os.path.getmtime('/path/to/index').AndReturn(10.0)
+        watch.sleep(1.0)
+        os.path.getmtime('/path/to/index').AndReturn(10.0)
+        watch.sleep(2.0)
+        os.path.getmtime('/path/to/index').AndReturn(20.0)
+        watch.sleep(0.5)
+        os.path.getmtime('/path/to/index').AndReturn(20.0)
+        self.mox.ReplayAll()
+        watcher.watch(['/path/to/index'])
+        self.assertFalse(watcher.wait())
+        self.assertFalse(watcher.wait())
+        self.assertTrue(watcher.wait())
+        self.assertFalse(watcher.wait())
+
+
+class TestInotifyWatcher(MoxTestBase):
+
+    def setUp(self):
+        super(TestInotifyWatcher, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'binlog.000001')
+        with open(self.path, 'w') as f:
+            f.write('x')
+
+    def tearDown(self):
+        super(TestInotifyWatcher, self).tearDown()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_wait(self):
+        watcher = get_watcher(max_delay=0.01)
+        if not isinstance(watcher, InotifyWatcher):
+            return
+        try:
+            watcher.watch([self.path])
+            with open(self.path, 'a') as f:
+                f.write('y')
+            self.assertTrue(watcher.wait())
+            watcher.watch([self.path, self.path + '.missing'])
+            self.assertFalse(watcher.wait())
+        finally:
+            watcher.close()
+
+
+# vim:et:fdm=marker:sts=4:sw=4:ts=4